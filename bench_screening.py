@@ -0,0 +1,261 @@
+# bench_screening.py
+# Headless benchmark for the Screening_Check name search (no Streamlit needed).
+# Generates synthetic Marathi populations, runs a fixed query workload and
+# reports latency, throughput, peak memory and top-15 recall against the
+# reference scoring (compute_best_score_for_row).
+#
+#   python bench_screening.py                       # 10k, 100k, 1M rows
+#   python bench_screening.py --sizes 10k,100k --queries 50 --json bench.json
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from screening_search import (
+    MIN_CANDIDATES, MIN_TRIGRAM_OVERLAP, SCREENING_COLS, build_screening_data, compact_types, compute_best_score_for_row,
+    normalize_names, score_query, search_scores, top_n_indices,
+)
+
+TOP_N = 15
+
+# ---------- Synthetic population ----------
+MALE_FIRST = [
+    "Rajendra", "Sunil", "Santosh", "Vikas", "Mahadev", "Sandip", "Ganesh", "Dattatray", "Balasaheb",
+    "Shivaji", "Vilas", "Ramesh", "Suresh", "Prakash", "Ashok", "Anil", "Sanjay", "Dnyaneshwar",
+    "Pandurang", "Machhindra", "Sadashiv", "Tukaram", "Vitthal", "Bapu", "Nitin", "Sachin", "Rahul",
+    "Amol", "Swapnil", "Akshay", "Omkar", "Om", "Samrat", "Shubham", "Pratik", "Aniket", "Sagar",
+    "Yogesh", "Mahesh", "Dinkar", "Narayan", "Bhausaheb", "Hanumant", "Dhanaji", "Kisan", "Maruti",
+]
+FEMALE_FIRST = [
+    "Sujata", "Sunita", "Anita", "Manisha", "Sangita", "Savita", "Vaishali", "Jyoti", "Rupali",
+    "Swati", "Pushpa", "Shobha", "Mangal", "Lata", "Suman", "Kamal", "Sindhu", "Akanksha", "Pooja",
+    "Priyanka", "Ashwini", "Komal", "Snehal", "Supriya", "Sarika", "Rohini", "Kalpana", "Archana",
+    "Chhaya", "Usha", "Bharati", "Nanda", "Shalan", "Parvati", "Rukmini", "Sakhubai", "Hirabai",
+]
+LAST = [
+    "Pawar", "Jadhav", "Shinde", "Gaikwad", "Kale", "Deshmukh", "Patil", "More", "Bhosale", "Gawade",
+    "Devkule", "Shingade", "Borkar", "Bansode", "Hegade", "Markad", "Kadam", "Chavan", "Mane", "Salunkhe",
+    "Kumbhar", "Mali", "Dhaygude", "Khandagale", "Lokhande", "Waghmare", "Sonawane", "Thorat", "Nimbalkar",
+    "Jagtap", "Kharat", "Shelke", "Ghadge", "Bhise", "Lonkar", "Dhumal", "Raut", "Sawant", "Tanpure",
+]
+VILLAGES = ["Shelgaon  (31885)", "Kadbanwadi  (31888)", "Other"]
+STATUSES = ["Pending Screening", "Completed Screening", "Not Eligible for Screening", "Not Applicable"]
+
+# spelling variants seen when names are typed in English
+TRANSLITERATIONS = [
+    ("ee", "i"), ("i", "ee"), ("oo", "u"), ("u", "oo"), ("sh", "s"), ("v", "w"), ("w", "v"),
+    ("aa", "a"), ("th", "t"), ("dh", "d"), ("kh", "k"), ("ksh", "x"), ("chh", "ch"), ("ay", "ai"),
+    ("av", "ao"), ("e", "a"), ("a", "aa"),
+]
+
+
+def _zipf_choice(rng, items, size, a=1.2):
+    """Pick from `items` with a Zipf-like popularity (a few very common names)."""
+    weights = 1.0 / np.arange(1, len(items) + 1) ** a
+    return np.asarray(items, dtype=object)[rng.choice(len(items), size=size, p=weights / weights.sum())]
+
+
+def synthetic_population(n, seed=0):
+    """A screening-sheet-like frame with n people."""
+    rng = np.random.default_rng(seed)
+    female = rng.random(n) < 0.5
+    first = np.where(female, _zipf_choice(rng, FEMALE_FIRST, n), _zipf_choice(rng, MALE_FIRST, n))
+    # middle name is the father's / husband's first name; sometimes missing
+    middle = _zipf_choice(rng, MALE_FIRST, n)
+    middle = np.where(rng.random(n) < 0.15, "", middle)
+    last = _zipf_choice(rng, LAST, n)
+    # some sheets carry first+middle in First Name, some are typed in lower/upper case
+    two_token = rng.random(n) < 0.05
+    first = np.where(two_token, first + " " + middle, first)
+    middle = np.where(two_token, "", middle)
+    case = rng.random(n)
+    df = pd.DataFrame({
+        "Village": _zipf_choice(rng, VILLAGES, n, a=2.0),
+        "First Name": first,
+        "Middle Name": middle,
+        "Last Name": last,
+        "Mobile #": np.where(rng.random(n) < 0.6, rng.integers(7_000_000_000, 9_999_999_999, n).astype(str), ""),
+        "Age": rng.integers(1, 95, n).astype(str),
+        "Sex": np.where(female, "F", "M"),
+    })
+    for c in ["First Name", "Middle Name", "Last Name"]:
+        df[c] = np.where(case < 0.1, df[c].str.lower(), np.where(case > 0.97, df[c].str.upper(), df[c]))
+    for c in SCREENING_COLS:
+        df[c] = rng.choice(STATUSES, size=n, p=[0.7, 0.2, 0.05, 0.05])
+    return compact_types(normalize_names(df.astype(object)))
+
+
+def _typo(rng, s):
+    if len(s) < 3:
+        return s
+    i = int(rng.integers(len(s) - 1))
+    op = rng.integers(4)
+    if op == 0:
+        return s[:i] + s[i + 1:]                              # deletion
+    if op == 1:
+        return s[:i] + "aeioumnh"[rng.integers(8)] + s[i + 1:]  # substitution
+    if op == 2:
+        return s[:i] + "aeih"[rng.integers(4)] + s[i:]          # insertion
+    return s[:i] + s[i + 1] + s[i] + s[i + 2:]                # transposition
+
+
+def _transliterate(rng, s):
+    low = s.lower()
+    options = [(a, b) for a, b in TRANSLITERATIONS if a in low]
+    if not options:
+        return s
+    a, b = options[rng.integers(len(options))]
+    i = low.find(a)
+    return s[:i] + b + s[i + len(a):]
+
+
+def query_workload(df, n, seed=1):
+    """Fixed mix of exact, partial and misspelled names drawn from the population."""
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(len(df), size=n)
+    queries = []
+    for k, i in enumerate(picks):
+        row = df.iloc[int(i)]
+        first, middle, last = str(row["First Name"]), str(row["Middle Name"]), str(row["Last Name"])
+        kind = k % 6
+        if kind == 0:
+            q = row["_full"]                                   # exact full name
+        elif kind == 1:
+            q = " ".join(t for t in [first.split()[0], last] if t)  # first + last
+        elif kind == 2:
+            q = " ".join(t for t in [middle, last] if t)       # middle + last
+        elif kind == 3:
+            q = _typo(rng, str(row["_full"]))                  # typo
+        elif kind == 4:
+            q = _transliterate(rng, str(row["_full"]))         # transliteration
+        else:
+            q = _typo(rng, _transliterate(rng, first.split()[0]))  # noisy first name only
+        queries.append(str(q).strip() or first)
+    return queries
+
+
+# ---------- Measurement ----------
+def _topk_recall(ref_scores, found, k=TOP_N):
+    """Share of returned rows that belong in the reference top-k (ties count as hits)."""
+    if len(found) == 0:
+        return 0.0
+    kth = np.sort(ref_scores)[-k] if len(ref_scores) >= k else ref_scores.min()
+    return float(np.mean(ref_scores[found] >= kth))
+
+
+def _check_reference(data, query, ref_scores, rng, n_rows):
+    """Compare the batched reference with compute_best_score_for_row on sampled rows."""
+    rows = rng.choice(len(data.df), size=min(n_rows, len(data.df)), replace=False)
+    q_lc = query.casefold()
+    return sum(
+        compute_best_score_for_row(data.df.iloc[int(i)], query, q_lc) != ref_scores[int(i)] for i in rows
+    )
+
+
+def run_one(size, n_queries, seed=0, check_rows=20):
+    """Benchmark one population size in this process."""
+    t = time.perf_counter()
+    df = synthetic_population(size, seed=seed)
+    generate_s = time.perf_counter() - t
+    t = time.perf_counter()
+    data = build_screening_data(df)
+    build_s = time.perf_counter() - t
+    queries = query_workload(df, n_queries)
+
+    engines = {
+        "full scan": lambda q, ql: score_query(data.variants, q, ql),
+        "trigram": lambda q, ql: search_scores(
+            data.variants, data.trigrams, q, ql, MIN_TRIGRAM_OVERLAP, MIN_CANDIDATES),
+    }
+    rng = np.random.default_rng(seed)
+    latencies = {name: [] for name in engines}
+    recalls = {name: [] for name in engines}
+    mismatches = 0
+    for q in queries:
+        q_lc = q.casefold()
+        # reference: batched full scan, spot-checked against the row-at-a-time matcher
+        ref = score_query(data.variants, q, q_lc)
+        mismatches += _check_reference(data, q, ref, rng, check_rows)
+        for name, engine in engines.items():
+            t = time.perf_counter()
+            scores = engine(q, q_lc)
+            top = top_n_indices(scores, data.full, TOP_N)
+            latencies[name].append(time.perf_counter() - t)
+            recalls[name].append(_topk_recall(ref, top))
+
+    result = {
+        "rows": size,
+        "queries": len(queries),
+        "generate_s": generate_s,
+        "index_build_s": build_s,
+        "reference_mismatches": int(mismatches),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "engines": {},
+    }
+    for name in engines:
+        lat = np.array(latencies[name]) * 1000
+        result["engines"][name] = {
+            "p50_ms": float(np.percentile(lat, 50)),
+            "p95_ms": float(np.percentile(lat, 95)),
+            "p99_ms": float(np.percentile(lat, 99)),
+            "qps": float(len(lat) / (lat.sum() / 1000)),
+            "recall_at_15": float(np.mean(recalls[name])),
+        }
+    return result
+
+
+def parse_size(text):
+    text = text.strip().lower()
+    mult = {"k": 1_000, "m": 1_000_000}.get(text[-1], 1)
+    return int(float(text.rstrip("km")) * mult)
+
+
+def print_report(results):
+    print(f"{'rows':>9} {'engine':<10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'q/s':>8} "
+          f"{'recall@15':>9} {'build s':>8} {'peak MB':>8} {'ref diff':>8}")
+    for r in results:
+        for name, e in r["engines"].items():
+            print(f"{r['rows']:>9} {name:<10} {e['p50_ms']:>8.1f} {e['p95_ms']:>8.1f} {e['p99_ms']:>8.1f} "
+                  f"{e['qps']:>8.1f} {e['recall_at_15']:>9.3f} {r['index_build_s']:>8.1f} "
+                  f"{r['peak_rss_mb']:>8.0f} {r['reference_mismatches']:>8}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Screening_Check name search")
+    parser.add_argument("--sizes", default="10k,100k,1M", help="comma separated population sizes")
+    parser.add_argument("--queries", type=int, default=100, help="queries per size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--check-rows", type=int, default=20,
+                        help="rows per query compared with compute_best_score_for_row")
+    parser.add_argument("--json", default=None, help="also write the results to this file")
+    parser.add_argument("--_one", type=int, default=None, help=argparse.SUPPRESS)
+    ns = parser.parse_args(argv)
+
+    if ns._one is not None:
+        print(json.dumps(run_one(ns._one, ns.queries, seed=ns.seed, check_rows=ns.check_rows)))
+        return
+
+    results = []
+    for size in [parse_size(s) for s in ns.sizes.split(",") if s.strip()]:
+        # one process per size so peak memory is measured per population
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--_one", str(size), "--queries", str(ns.queries),
+             "--seed", str(ns.seed), "--check-rows", str(ns.check_rows)],
+            capture_output=True, text=True, check=True,
+        )
+        results.append(json.loads(proc.stdout))
+        print(f"done {size} rows", file=sys.stderr)
+    print_report(results)
+    if ns.json:
+        with open(ns.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+# bulk_import.py
+# Spreadsheet imports into the register tables: vectorized validation,
+# COPY FROM STDIN into a temporary staging table, then one set-based merge.
+# M No sheets are merged with INSERT ... ON CONFLICT in a single transaction;
+# beneficiary lists are streamed in chunks with a server-side duplicate check.
+import io
+import time
+from datetime import date, datetime
+
+import pandas as pd
+from openpyxl import load_workbook
+
+MNO_COLUMNS = ["m_no", "family_head", "member", "ranjan", "balar", "taki", "dera", "freezer", "exta_bhandi"]
+MNO_COUNT_COLUMNS = ["member", "ranjan", "balar", "taki", "dera", "freezer", "exta_bhandi"]
+
+BENEFICIARY_COLUMNS = ["name", "dob", "gender", "boot_no"]
+BENEFICIARY_ALIASES = {"booth_no": "boot_no", "booth": "boot_no", "birth_date": "dob", "birthdate": "dob", "sex": "gender"}
+CHUNK_ROWS = 5000
+
+# gender codes are stored as M / F / O (the Add form); older rows and sheets
+# may say Male/Female/Other or use Marathi words
+GENDER_CODES = ["M", "F", "O"]
+_GENDER_MAP = {
+    "m": "M", "male": "M", "boy": "M", "पुरुष": "M", "मुलगा": "M", "पु": "M",
+    "f": "F", "female": "F", "girl": "F", "स्त्री": "F", "मुलगी": "F", "स्": "F",
+    "o": "O", "other": "O", "इतर": "O",
+}
+
+
+def read_upload(uploaded):
+    """CSV or XLSX upload as an all-text DataFrame with trimmed, lower-case headers."""
+    name = getattr(uploaded, "name", str(uploaded)).lower()
+    if name.endswith(".csv"):
+        df = pd.read_csv(uploaded, dtype=str, keep_default_na=False)
+    else:
+        df = pd.read_excel(uploaded, dtype=str, keep_default_na=False)
+    df.columns = [str(c).strip().lower() for c in df.columns]
+    return df
+
+
+def _add_errors(errors, mask, message):
+    errors.loc[mask] = errors.loc[mask].where(errors.loc[mask] == "", errors.loc[mask] + "; ") + message
+
+
+def _int_column(values, errors, col, required):
+    """Parse a text column as whole numbers >= 0; blanks are 0 unless required."""
+    text = values.fillna("").astype(str).str.strip()
+    blank = text == ""
+    nums = pd.to_numeric(text.mask(blank), errors="coerce")
+    bad = ~blank & (nums.isna() | (nums < 0) | (nums % 1 != 0))
+    _add_errors(errors, bad, f"{col} must be a whole number >= 0")
+    if required:
+        _add_errors(errors, blank, f"{col} is required")
+    return nums.fillna(0).where(~bad, 0).astype("int64")
+
+
+def validate_mno(df):
+    """
+    Check an uploaded M No sheet. Returns (clean, errors):
+      clean  - valid rows with MNO_COLUMNS, typed for COPY
+      errors - one row per rejected line: spreadsheet row number, m_no, reason
+    Raises ValueError when required columns are missing.
+    """
+    missing = [c for c in ["m_no", "family_head"] if c not in df.columns]
+    if missing:
+        raise ValueError(f"Missing column(s): {', '.join(missing)}")
+    df = df.reset_index(drop=True)
+    errors = pd.Series("", index=df.index, dtype=object)
+
+    out = pd.DataFrame(index=df.index)
+    out["m_no"] = _int_column(df["m_no"], errors, "m_no", required=True)
+    out["family_head"] = df["family_head"].fillna("").astype(str).str.strip()
+    _add_errors(errors, out["family_head"] == "", "family_head is required")
+    for col in MNO_COUNT_COLUMNS:
+        if col in df.columns:
+            out[col] = _int_column(df[col], errors, col, required=False)
+        else:
+            out[col] = 0
+
+    # the last valid occurrence of a repeated m_no wins, like a second upload
+    # would; invalid copies are reported on their own and do not count
+    ok = errors == ""
+    dup = out.loc[ok, "m_no"].duplicated(keep="last").reindex(out.index, fill_value=False)
+    _add_errors(errors, dup, "m_no repeated later in the file")
+
+    bad = errors != ""
+    report = pd.DataFrame({
+        "row": df.index[bad] + 2,  # +1 header, +1 one-based
+        "m_no": df.loc[bad, "m_no"],
+        "error": errors[bad],
+    })
+    return out.loc[~bad, MNO_COLUMNS].reset_index(drop=True), report.reset_index(drop=True)
+
+
+def copy_upsert(conn, table, df, key, columns):
+    """
+    COPY `df[columns]` into a temp staging table and merge into `table` with
+    INSERT ... ON CONFLICT (key) DO UPDATE, in one transaction.
+    Returns {"inserted", "updated", "seconds", "rows_per_s"}.
+    """
+    start = time.perf_counter()
+    cols = ", ".join(columns)
+    updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in columns if c != key)
+    buf = io.StringIO()
+    df[columns].to_csv(buf, index=False, header=False)
+    buf.seek(0)
+
+    cur = conn.cursor()
+    try:
+        cur.execute(f"CREATE TEMP TABLE staging_{table} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP")
+        cur.copy_expert(f"COPY staging_{table} ({cols}) FROM STDIN WITH (FORMAT csv)", buf)
+        cur.execute(
+            f"INSERT INTO {table} ({cols}) SELECT {cols} FROM staging_{table} "
+            f"ON CONFLICT ({key}) DO UPDATE SET {updates} "
+            f"RETURNING (xmax = 0) AS inserted"
+        )
+        flags = [r[0] for r in cur.fetchall()]
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    seconds = time.perf_counter() - start
+    return {
+        "inserted": sum(flags),
+        "updated": len(flags) - sum(flags),
+        "seconds": seconds,
+        "rows_per_s": len(df) / seconds if seconds > 0 else float("inf"),
+    }
+
+
+# ---------- Beneficiaries: streaming loader ----------
+def normalize_gender(values):
+    """Map gender spellings to M / F / O; unknown values become NaN."""
+    return values.fillna("").astype(str).str.strip().str.casefold().map(_GENDER_MAP)
+
+
+def _clean_header(cols):
+    cols = [str(c).strip().lower().replace(" ", "_") if c is not None else "" for c in cols]
+    return [BENEFICIARY_ALIASES.get(c, c) for c in cols]
+
+
+def _xlsx_chunks(uploaded, chunksize):
+    # read-only mode streams rows from the sheet XML instead of building the whole workbook
+    wb = load_workbook(uploaded, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = _clean_header(next(rows, []))
+        width = len(header)
+        batch, numbers = [], []
+        for number, row in enumerate(rows, start=2):
+            if all(v is None or str(v).strip() == "" for v in row):
+                continue
+            batch.append((tuple(row) + (None,) * width)[:width])
+            numbers.append(number)
+            if len(batch) == chunksize:
+                yield pd.DataFrame(batch, columns=header).assign(_row=numbers)
+                batch, numbers = [], []
+        if batch:
+            yield pd.DataFrame(batch, columns=header).assign(_row=numbers)
+    finally:
+        wb.close()
+
+
+def _csv_chunks(uploaded, chunksize):
+    start = 2
+    for chunk in pd.read_csv(uploaded, dtype=str, keep_default_na=False, chunksize=chunksize):
+        chunk.columns = _clean_header(chunk.columns)
+        yield chunk.assign(_row=range(start, start + len(chunk)))
+        start += len(chunk)
+
+
+def iter_upload_chunks(uploaded, chunksize=CHUNK_ROWS):
+    """
+    CSV or XLSX upload as DataFrames of at most `chunksize` rows, with
+    normalized headers and a `_row` column holding the spreadsheet row number.
+    """
+    name = getattr(uploaded, "name", str(uploaded)).lower()
+    if name.endswith(".csv"):
+        return _csv_chunks(uploaded, chunksize)
+    return _xlsx_chunks(uploaded, chunksize)
+
+
+def count_upload_rows(uploaded):
+    """Data rows in an upload, for progress bars: the sheet's dimension for XLSX, line count for CSV."""
+    name = getattr(uploaded, "name", str(uploaded)).lower()
+    try:
+        if name.endswith(".csv"):
+            return max(uploaded.getvalue().count(b"\n") - 1, 1)
+        wb = load_workbook(uploaded, read_only=True)
+        try:
+            return max((wb.active.max_row or 1) - 1, 1)
+        finally:
+            wb.close()
+    finally:
+        uploaded.seek(0)
+
+
+def _booth_text(values):
+    # Excel hands numeric booth numbers back as floats: 3.0 -> "3"
+    text = values.map(lambda v: "" if v is None or pd.isna(v) else str(v).strip())
+    return text.str.replace(r"^(\d+)\.0+$", r"\1", regex=True)
+
+
+def validate_beneficiaries(chunk, today=None):
+    """
+    Check one chunk of a beneficiary sheet. Returns (clean, errors) like
+    validate_mno(); dates may be Excel dates, ISO or day-first text.
+    Raises ValueError when required columns are missing.
+    """
+    missing = [c for c in BENEFICIARY_COLUMNS if c not in chunk.columns]
+    if missing:
+        raise ValueError(f"Missing column(s): {', '.join(missing)}")
+    chunk = chunk.reset_index(drop=True)
+    errors = pd.Series("", index=chunk.index, dtype=object)
+    today = pd.Timestamp(today or pd.Timestamp.today().normalize())
+
+    out = pd.DataFrame(index=chunk.index)
+    out["name"] = chunk["name"].map(lambda v: "" if v is None or pd.isna(v) else " ".join(str(v).split()))
+    _add_errors(errors, out["name"] == "", "name is required")
+
+    dob = chunk["dob"].map(lambda v: v if isinstance(v, (date, datetime)) else (None if v is None else str(v).strip()))
+    dob = pd.to_datetime(dob, dayfirst=True, errors="coerce", format="mixed")
+    _add_errors(errors, dob.isna(), "dob is not a valid date")
+    _add_errors(errors, dob > today, "dob is in the future")
+    out["dob"] = dob.dt.date
+
+    out["gender"] = normalize_gender(chunk["gender"])
+    _add_errors(errors, out["gender"].isna(), "gender must be M/F/O (or Male/Female/Other)")
+
+    out["boot_no"] = _booth_text(chunk["boot_no"])
+    _add_errors(errors, out["boot_no"] == "", "boot_no is required")
+
+    bad = errors != ""
+    rows = chunk["_row"] if "_row" in chunk.columns else pd.Series(chunk.index + 2)
+    report = pd.DataFrame({"row": rows[bad], "name": out.loc[bad, "name"], "error": errors[bad]})
+    return out.loc[~bad, BENEFICIARY_COLUMNS].reset_index(drop=True), report.reset_index(drop=True)
+
+
+def copy_new_beneficiaries(conn, df):
+    """
+    COPY one batch into a temp staging table and insert the rows whose
+    (name, dob, boot_no) is not already in beneficiaries (or earlier in the
+    batch). Commits the batch; returns the number of rows inserted.
+    """
+    cols = ", ".join(BENEFICIARY_COLUMNS)
+    buf = io.StringIO()
+    df[BENEFICIARY_COLUMNS].to_csv(buf, index=False, header=False)
+    buf.seek(0)
+    cur = conn.cursor()
+    try:
+        cur.execute("CREATE TEMP TABLE staging_beneficiaries (LIKE beneficiaries INCLUDING DEFAULTS) ON COMMIT DROP")
+        cur.copy_expert(f"COPY staging_beneficiaries ({cols}) FROM STDIN WITH (FORMAT csv)", buf)
+        cur.execute(
+            f"INSERT INTO beneficiaries ({cols}) "
+            f"SELECT DISTINCT ON (s.name, s.dob, s.boot_no) {', '.join('s.' + c for c in BENEFICIARY_COLUMNS)} "
+            f"FROM staging_beneficiaries s "
+            f"WHERE NOT EXISTS (SELECT 1 FROM beneficiaries b "
+            f"WHERE b.boot_no = s.boot_no AND b.dob = s.dob AND b.name = s.name)"
+        )
+        inserted = cur.rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    return inserted
+
+
+def load_beneficiaries(conn, chunks):
+    """
+    Validate and load chunks one at a time, committing each batch, so memory
+    stays bounded by the chunk size. Yields a progress dict per chunk:
+    rows, inserted, duplicates, rejected (running totals), errors (this
+    chunk), seconds and rows_per_s.
+    """
+    start = time.perf_counter()
+    totals = {"rows": 0, "inserted": 0, "duplicates": 0, "rejected": 0}
+    for chunk in chunks:
+        clean, errors = validate_beneficiaries(chunk)
+        inserted = copy_new_beneficiaries(conn, clean) if len(clean) else 0
+        totals["rows"] += len(chunk)
+        totals["inserted"] += inserted
+        totals["duplicates"] += len(clean) - inserted
+        totals["rejected"] += len(errors)
+        seconds = time.perf_counter() - start
+        yield dict(totals, errors=errors, seconds=seconds,
+                   rows_per_s=totals["rows"] / seconds if seconds > 0 else float("inf"))
@@ -0,0 +1,278 @@
+# db.py
+# One process-wide Postgres connection pool shared by all pages.
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+import streamlit as st
+from sqlalchemy import create_engine
+from sqlalchemy.engine import URL
+
+# Read Postgres secrets from Streamlit secrets.toml
+db = st.secrets["postgres"]
+
+# pool settings (can be overridden in the [postgres] section of secrets.toml)
+POOL_SIZE = int(db.get("pool_size", 5))          # warm connections kept open
+POOL_MAX_OVERFLOW = int(db.get("pool_max_overflow", 5))  # extra connections under load
+POOL_TIMEOUT_S = float(db.get("pool_timeout", 10))       # max wait for a free connection
+POOL_RECYCLE_S = int(db.get("pool_recycle", 1800))       # reopen connections older than this
+CONNECT_TIMEOUT_S = int(db.get("connect_timeout", 10))
+STATEMENT_TIMEOUT_MS = int(db.get("statement_timeout_ms", 30000))
+
+# read cache: results live until one of their tables changes, or this long at most
+READ_CACHE_TTL_S = 600
+# how often Postgres' own write counters are checked for writes made outside this app
+EXTERNAL_CHECK_S = 30
+
+
+class PoolMetrics:
+    """Checkout counters and wait times, shared by every session."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.failures = 0
+        self.wait_total_s = 0.0
+        self.wait_max_s = 0.0
+        self.last_wait_s = 0.0
+
+    def record(self, wait_s, failed=False):
+        with self._lock:
+            if failed:
+                self.failures += 1
+                return
+            self.checkouts += 1
+            self.wait_total_s += wait_s
+            self.wait_max_s = max(self.wait_max_s, wait_s)
+            self.last_wait_s = wait_s
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "failures": self.failures,
+                "avg_wait_ms": 1000 * self.wait_total_s / self.checkouts if self.checkouts else 0.0,
+                "max_wait_ms": 1000 * self.wait_max_s,
+                "last_wait_ms": 1000 * self.last_wait_s,
+            }
+
+
+@st.cache_resource
+def get_engine():
+    url = URL.create(
+        "postgresql+psycopg2",
+        username=db["user"],
+        password=db["password"],
+        host=db["host"],
+        port=int(db["port"]),
+        database=db["dbname"],
+    )
+    return create_engine(
+        url,
+        pool_size=POOL_SIZE,
+        max_overflow=POOL_MAX_OVERFLOW,
+        pool_timeout=POOL_TIMEOUT_S,
+        pool_recycle=POOL_RECYCLE_S,
+        pool_pre_ping=True,  # health check on checkout; dead connections are replaced
+        connect_args={
+            "sslmode": "require",
+            "connect_timeout": CONNECT_TIMEOUT_S,
+            "options": f"-c statement_timeout={STATEMENT_TIMEOUT_MS}",
+            "keepalives": 1,
+            "keepalives_idle": 60,
+        },
+    )
+
+
+@st.cache_resource
+def get_pool_metrics():
+    return PoolMetrics()
+
+
+@contextmanager
+def get_connection():
+    """
+    Borrow a psycopg2 connection from the shared pool:
+
+        with get_connection() as conn:
+            cur = conn.cursor()
+            ...
+            conn.commit()
+
+    On exit the connection goes back to the pool (uncommitted work is rolled back).
+    """
+    metrics = get_pool_metrics()
+    start = time.perf_counter()
+    try:
+        conn = get_engine().raw_connection()
+    except Exception:
+        # pool timeout or connection error
+        metrics.record(time.perf_counter() - start, failed=True)
+        raise
+    metrics.record(time.perf_counter() - start)
+    try:
+        yield conn
+    finally:
+        conn.close()  # returns it to the pool
+
+
+def render_pool_metrics():
+    """Small sidebar panel with pool status and checkout wait times."""
+    m = get_pool_metrics().snapshot()
+    with st.sidebar.expander("DB connection pool"):
+        st.caption(get_engine().pool.status())
+        st.write(
+            f"Checkouts: {m['checkouts']} (failed: {m['failures']})  \n"
+            f"Wait avg / max / last: {m['avg_wait_ms']:.1f} / {m['max_wait_ms']:.1f} / {m['last_wait_ms']:.1f} ms"
+        )
+
+
+# ---------- Cached reads ----------
+class TableVersions:
+    """Per-table counters bumped by this app's own writes; part of every read cache key."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = {}
+
+    def get(self, table):
+        with self._lock:
+            return self._versions.get(table, 0)
+
+    def bump(self, *tables):
+        with self._lock:
+            for t in tables:
+                self._versions[t] = self._versions.get(t, 0) + 1
+
+
+@st.cache_resource
+def get_table_versions():
+    return TableVersions()
+
+
+@st.cache_data(ttl=EXTERNAL_CHECK_S, show_spinner=False)
+def _write_stamp(table):
+    # insert/update/delete totals from the statistics collector: a cheap catalog
+    # lookup that changes whenever anyone writes to the table
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT n_tup_ins, n_tup_upd, n_tup_del FROM pg_stat_user_tables WHERE relname = %s",
+            (table,)
+        )
+        row = cur.fetchone()
+        cur.close()
+    return tuple(row) if row else None
+
+
+@st.cache_data(ttl=READ_CACHE_TTL_S, max_entries=64, show_spinner=False)
+def _cached_read(sql, params, stamp):
+    with get_connection() as conn:
+        return pd.read_sql(sql, conn, params=params)
+
+
+def cached_read(sql, tables, params=None):
+    """
+    pd.read_sql through a shared cache. `tables` are the tables the query reads;
+    the result is reused until one of them is written by this app (mark_changed),
+    its Postgres write counters move (checked every EXTERNAL_CHECK_S), or
+    READ_CACHE_TTL_S passes. Every caller gets its own copy of the DataFrame.
+    """
+    return _cached_read(sql, tuple(params) if params is not None else None, table_stamp(tables))
+
+
+def table_stamp(tables):
+    """Cache key part that changes whenever one of `tables` is written (see cached_read)."""
+    versions = get_table_versions()
+    return tuple((t, versions.get(t), _write_stamp(t)) for t in tables)
+
+
+def mark_changed(*tables):
+    """Call after committing an INSERT/UPDATE/DELETE so cached reads of `tables` are refreshed."""
+    get_table_versions().bump(*tables)
+    _write_stamp.clear()
+
+
+# ---------- Schema ----------
+# Extensions and indexes the pages rely on. They are built by the one-off
+# `python migrate.py` with CREATE INDEX CONCURRENTLY, which does not block
+# writes; page requests only check that they exist (missing_indexes).
+EXTENSIONS = ["pg_trgm"]
+BOOTH_DOB_INDEX = "beneficiaries_boot_no_dob_idx"
+INDEXES = {
+    # record picker: key prefix (key::text LIKE 'q%') and label substring (ILIKE '%q%')
+    "m_no_register_m_no_prefix_idx": "m_no_register ((m_no::text) text_pattern_ops)",
+    "m_no_register_family_head_trgm_idx": "m_no_register USING gin (family_head gin_trgm_ops)",
+    "beneficiaries_id_prefix_idx": "beneficiaries ((id::text) text_pattern_ops)",
+    "beneficiaries_name_trgm_idx": "beneficiaries USING gin (name gin_trgm_ops)",
+    # bulk enrolment duplicate probe and the 0-5 year booth lists (dob range per booth)
+    BOOTH_DOB_INDEX: "beneficiaries (boot_no, dob)",
+}
+
+
+def create_indexes(names=None):
+    """
+    Create the extensions and the indexes in INDEXES (or just `names`).
+    Every statement runs on its own in autocommit mode, so one failure (e.g.
+    no right to install pg_trgm) does not stop the rest. An invalid index left
+    by an interrupted concurrent build is dropped and built again.
+    Returns {extension or index name: None when in place, else the error text}.
+    """
+    results = {}
+    with get_connection() as conn:
+        conn.rollback()
+        conn.autocommit = True  # CREATE INDEX CONCURRENTLY cannot run in a transaction
+        cur = conn.cursor()
+        try:
+            cur.execute("SET statement_timeout = 0")
+            for ext in EXTENSIONS:
+                try:
+                    cur.execute(f"CREATE EXTENSION IF NOT EXISTS {ext}")
+                    results[ext] = None
+                except Exception as e:
+                    results[ext] = str(e).strip()
+            for name in names or INDEXES:
+                try:
+                    cur.execute(
+                        "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                        "WHERE c.relname = %s", (name,)
+                    )
+                    row = cur.fetchone()
+                    if row and not row[0]:
+                        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+                    cur.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {INDEXES[name]}")
+                    results[name] = None
+                except Exception as e:
+                    results[name] = str(e).strip()
+        finally:
+            cur.execute("RESET statement_timeout")
+            cur.close()
+            conn.autocommit = False
+    return results
+
+
+@st.cache_data(ttl=READ_CACHE_TTL_S, show_spinner=False)
+def missing_indexes(names):
+    """The names in `names` with no valid index in the database (catalog lookup only)."""
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = ANY(%s) AND i.indisvalid", (list(names),)
+        )
+        present = {r[0] for r in cur.fetchall()}
+        cur.close()
+    return [n for n in names if n not in present]
+
+
+def warn_missing_indexes(names, purpose):
+    """st.warning naming the indexes behind `purpose` that are missing; never raises."""
+    try:
+        missing = missing_indexes(tuple(names))
+    except Exception as e:
+        st.warning(f"Could not check the indexes for {purpose}: {e}")
+        return
+    if missing:
+        st.warning(f"{purpose} is running without its index ({', '.join(missing)}) and will be slow "
+                   "on a large table. Run `python migrate.py` once to create it.")
@@ -0,0 +1,365 @@
+# exports.py
+# Streaming table exports. Rows come from Postgres in chunks and are written
+# straight to a temp file, so memory stays flat while the file is built (the
+# finished file is then read once into the download):
+#   CSV     - COPY (query) TO STDOUT, no Python row objects at all
+#   Excel   - named (server-side) cursor -> openpyxl write-only sheet
+#   Parquet - named cursor -> pyarrow ParquetWriter, one row group per chunk
+# plus the server-rendered PDF reports (layout in pdf_reports.py). The
+# immunization due lists are loaded and cached in immunization.py.
+import datetime
+import decimal
+import io
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import groupby
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import streamlit as st
+from openpyxl import Workbook
+
+from db import BOOTH_DOB_INDEX, cached_read, get_connection, table_stamp
+from pdf_reports import render_booth_list, render_booth_pdf, render_mno_register
+
+EXPORT_CHUNK_ROWS = 10000
+PREVIEW_ROWS = 100
+# the booth list covers children aged 0-5 on the immunization date
+AGE_MAX_YEARS = 5
+# rows before a sequential scan of beneficiaries is worth a warning
+PLAN_CHECK_MIN_ROWS = 10000
+# temp files older than this are left over from a crashed export
+STALE_EXPORT_S = 3600
+# worker processes for the all-booth PDF batch
+PDF_WORKERS = max(1, min(4, os.cpu_count() or 1))
+# ZIP entry and timings label for beneficiaries with no booth number
+UNASSIGNED_BOOTH = "unassigned"
+
+FORMATS = {
+    "CSV": (".csv", "text/csv"),
+    "Excel": (".xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "Parquet": (".parquet", "application/vnd.apache.parquet"),
+}
+
+# Postgres type OIDs -> Arrow types; anything else is exported as text
+_ARROW_TYPES = {
+    16: pa.bool_(),
+    20: pa.int64(), 21: pa.int64(), 23: pa.int64(),
+    700: pa.float64(), 701: pa.float64(), 1700: pa.float64(),
+    1082: pa.date32(),
+    1114: pa.timestamp("us"), 1184: pa.timestamp("us", tz="UTC"),
+}
+
+
+def _no_statement_timeout(conn):
+    """
+    Lift the pool's statement_timeout for the current transaction only: a large
+    export is one long statement (COPY, or a cursor's whole result).
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute("SET LOCAL statement_timeout = 0")
+    finally:
+        cur.close()
+
+
+def iter_rows(conn, sql, params=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    Yield (cursor description, list of row tuples) chunks from a named cursor, so
+    Postgres holds the result and only `chunk_rows` rows are in Python at once.
+    An empty result yields one empty chunk, so callers still get the columns.
+    """
+    _no_statement_timeout(conn)
+    cur = conn.cursor(name=f"export_{os.getpid()}_{time.monotonic_ns()}")
+    cur.itersize = chunk_rows
+    try:
+        cur.execute(sql, params)
+        rows = cur.fetchmany(chunk_rows)
+        yield cur.description, rows
+        while rows:
+            rows = cur.fetchmany(chunk_rows)
+            if rows:
+                yield cur.description, rows
+    finally:
+        cur.close()
+        conn.rollback()  # ends the read transaction that kept the cursor open
+
+
+def write_csv(conn, sql, out):
+    """COPY the query result to `out` (a binary file) as CSV with a header."""
+    _no_statement_timeout(conn)
+    cur = conn.cursor()
+    try:
+        cur.copy_expert(f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, HEADER true, ENCODING 'UTF8')", out)
+    finally:
+        cur.close()
+        conn.rollback()
+
+
+def write_xlsx(conn, sql, out, sheet_name):
+    # write-only workbooks stream rows to disk instead of keeping cell objects
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_name)
+    header_written = False
+    for description, rows in iter_rows(conn, sql):
+        if not header_written:
+            ws.append([d.name for d in description])
+            header_written = True
+        for row in rows:
+            ws.append([float(v) if isinstance(v, decimal.Decimal) else v for v in row])
+    wb.save(out)
+
+
+def _arrow_schema(description):
+    return pa.schema([(d.name, _ARROW_TYPES.get(d.type_code, pa.string())) for d in description])
+
+
+def _arrow_value(val, typ):
+    if val is None:
+        return None
+    if pa.types.is_string(typ) and not isinstance(val, str):
+        return str(val)
+    if isinstance(val, decimal.Decimal):
+        return float(val)
+    if isinstance(val, datetime.datetime) and val.tzinfo is not None:
+        return val.astimezone(datetime.timezone.utc)
+    return val
+
+
+def write_parquet(conn, sql, out):
+    writer = None
+    try:
+        for description, rows in iter_rows(conn, sql):
+            if writer is None:
+                # an empty result still writes the schema: a file with columns and no rows
+                schema = _arrow_schema(description)
+                writer = pq.ParquetWriter(out, schema, compression="zstd")
+            if not rows:
+                continue
+            columns = list(zip(*rows))
+            arrays = [
+                pa.array([_arrow_value(v, field.type) for v in col], type=field.type)
+                for col, field in zip(columns, schema)
+            ]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+@st.cache_resource(show_spinner=False)
+def sweep_stale_exports():
+    """Once per process: remove phc_export_* temp files left behind by crashed exports."""
+    cutoff = time.time() - STALE_EXPORT_S
+    for name in os.listdir(tempfile.gettempdir()):
+        path = os.path.join(tempfile.gettempdir(), name)
+        try:
+            if name.startswith("phc_export_") and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+    return True
+
+
+def export_to_file(sql, fmt, sheet_name):
+    """Run the export into a temp file; returns (path, seconds)."""
+    suffix = FORMATS[fmt][0]
+    fd, path = tempfile.mkstemp(prefix="phc_export_", suffix=suffix)
+    start = time.perf_counter()
+    try:
+        with os.fdopen(fd, "wb") as out, get_connection() as conn:
+            if fmt == "CSV":
+                write_csv(conn, sql, out)
+            elif fmt == "Excel":
+                write_xlsx(conn, sql, out, sheet_name)
+            else:
+                write_parquet(conn, sql, out)
+    except Exception:
+        os.remove(path)
+        raise
+    return path, time.perf_counter() - start
+
+
+def render_export(sql, table, file_stem, state_key):
+    """Preview of the first rows, format choice and a streamed download."""
+    try:
+        preview = cached_read(f"{sql} LIMIT {PREVIEW_ROWS}", [table])
+    except Exception as e:
+        st.error(f"Failed to load data: {e}")
+        return
+    if preview.empty:
+        st.info("No data to export.")
+        return
+    st.caption(f"First {min(len(preview), PREVIEW_ROWS)} rows; the download contains the whole table.")
+    st.dataframe(preview, use_container_width=True, hide_index=True)
+
+    fmt = st.radio("Format", list(FORMATS), horizontal=True, key=f"{state_key}_fmt")
+    # the bytes are only held for the run that serves the button (not in session
+    # state), so a full export does not stay in memory for the whole session
+    ready = None
+    if st.button("Prepare download", key=f"{state_key}_prepare"):
+        sweep_stale_exports()
+        try:
+            with st.spinner("Exporting…"):
+                path, seconds = export_to_file(sql, fmt, table)
+            # the download button needs the bytes anyway; the temp file goes right away
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+            finally:
+                os.remove(path)
+            ready = (data, fmt, seconds)
+        except Exception as e:
+            st.error(f"Export failed: {e}")
+
+    if ready:
+        data, ready_fmt, seconds = ready
+        st.caption(f"{ready_fmt} file ready: {len(data) / 1e6:.1f} MB in {seconds:.1f} s")
+        suffix, mime = FORMATS[ready_fmt]
+        st.download_button(f"⬇️ Download {ready_fmt}", data=data, file_name=file_stem + suffix,
+                           mime=mime, key=f"{state_key}_download", on_click="ignore")
+
+
+# ---------- PDF reports ----------
+@st.cache_data(max_entries=16, show_spinner=False)
+def _cached_pdf(kind, sql, params, options, stamp):
+    start = time.perf_counter()
+    out = io.BytesIO()
+    with get_connection() as conn:
+        chunks = iter_rows(conn, sql, params=params)
+        if kind == "mno":
+            render_mno_register(chunks, out)
+        else:
+            render_booth_list(chunks, out, **dict(options))
+    return out.getvalue(), time.perf_counter() - start
+
+
+def build_pdf(kind, sql, tables, params=None, **options):
+    """
+    Render a report ("mno" or "booth") for `sql`; returns (pdf bytes, render
+    seconds). Identical requests reuse the cached PDF until one of `tables` changes.
+    """
+    return _cached_pdf(kind, sql, tuple(params) if params else None,
+                       tuple(sorted(options.items())), table_stamp(tables))
+
+
+@st.cache_resource
+def get_pdf_pool():
+    # spawn, not fork: the Streamlit server is multi-threaded; workers stay warm between batches
+    return ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+
+
+def _booth_key(booth_no):
+    if booth_no is None:
+        return (2, 0, "")  # unassigned last
+    text = str(booth_no)
+    return (0, int(text), text) if text.isdigit() else (1, 0, text)
+
+
+# Born after (date - 5 years) and on or before the date. Both bounds are plain
+# dates, so they form a range on the (boot_no, dob) index.
+_ELIGIBLE = f"dob > (%s::date - interval '{AGE_MAX_YEARS} years')::date AND dob <= %s::date"
+
+
+def booth_list_query(booth_no, imm_date):
+    """(sql, params) for one booth's beneficiaries eligible on `imm_date`, youngest last."""
+    sql = f"SELECT name, dob, gender FROM beneficiaries WHERE boot_no = %s AND {_ELIGIBLE} ORDER BY dob, id"
+    return sql, (booth_no, imm_date, imm_date)
+
+
+def count_eligible(booth_no, imm_date):
+    df = cached_read(
+        f"SELECT count(*) AS n FROM beneficiaries WHERE boot_no = %s AND {_ELIGIBLE}",
+        ["beneficiaries"], params=(booth_no, imm_date, imm_date),
+    )
+    return int(df["n"].iloc[0])
+
+
+def _plan_nodes(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+def check_booth_plan(booth_no, imm_date):
+    """
+    EXPLAIN the booth list query. Returns (index used, scan node types, table
+    rows as the planner sees them) so the page can warn when beneficiaries has
+    grown and the query still scans the whole table.
+    """
+    sql, params = booth_list_query(booth_no, imm_date)
+    df = cached_read(f"EXPLAIN (FORMAT JSON) {sql}", ["beneficiaries"], params=params)
+    plan = df.iloc[0, 0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    nodes = list(_plan_nodes(plan[0]["Plan"]))
+    uses_index = any(n.get("Index Name") == BOOTH_DOB_INDEX for n in nodes)
+    scans = sorted({n["Node Type"] for n in nodes if "Scan" in n["Node Type"]})
+    rows = cached_read(
+        "SELECT reltuples::bigint AS n FROM pg_class WHERE oid = 'beneficiaries'::regclass", ["beneficiaries"]
+    )
+    return uses_index, scans, int(rows["n"].iloc[0]) if len(rows) else -1
+
+
+def _booth_label(booth_no):
+    return UNASSIGNED_BOOTH if booth_no is None else str(booth_no)
+
+
+def fetch_booth_groups(conn, imm_date):
+    """
+    Every booth's eligible beneficiaries from one ordered query:
+    {boot_no: [(name, dob, gender), ...]}. A NULL or blank boot_no is
+    grouped under the key None (the unassigned list).
+    """
+    groups = {}
+    sql = f"SELECT boot_no, name, dob, gender FROM beneficiaries WHERE {_ELIGIBLE} ORDER BY boot_no, dob, id"
+    for _, rows in iter_rows(conn, sql, params=(imm_date, imm_date)):
+        # a booth can straddle two chunks, so extend rather than assign
+        for booth_no, booth_rows in groupby(rows, key=lambda r: r[0]):
+            if booth_no is not None and not str(booth_no).strip():
+                booth_no = None
+            groups.setdefault(booth_no, []).extend(r[1:] for r in booth_rows)
+    return groups
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def _cached_booth_zip(imm_date, stamp):
+    start = time.perf_counter()
+    ldate = imm_date.strftime("%d-%m-%Y")
+    with get_connection() as conn:
+        groups = fetch_booth_groups(conn, imm_date)
+    fetched = time.perf_counter() - start
+
+    pool = get_pdf_pool()
+    try:
+        futures = [pool.submit(render_booth_pdf, booth_no, rows, ldate) for booth_no, rows in groups.items()]
+        results = [f.result() for f in futures]
+    except BrokenProcessPool:
+        get_pdf_pool.clear()  # a worker died; start a fresh pool next time
+        raise
+
+    buf = io.BytesIO()
+    # PDFs are already compressed, so store them as-is
+    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_STORED) as zf:
+        for booth_no, pdf, _, _ in sorted(results, key=lambda r: _booth_key(r[0])):
+            zf.writestr(f"booth_{_booth_label(booth_no)}.pdf", pdf)
+    timings = [
+        {"booth": _booth_label(booth_no), "beneficiaries": n, "KB": round(len(pdf) / 1024), "seconds": round(sec, 2)}
+        for booth_no, pdf, n, sec in sorted(results, key=lambda r: _booth_key(r[0]))
+    ]
+    return buf.getvalue(), timings, fetched, time.perf_counter() - start
+
+
+def build_booth_zip(imm_date):
+    """
+    PDF booth lists for every booth in one ZIP, rendered in parallel, each
+    listing the children eligible on `imm_date`. Returns (zip bytes, per-booth
+    timings, fetch seconds, total seconds); cached until beneficiaries changes.
+    """
+    return _cached_booth_zip(imm_date, table_stamp(["beneficiaries"]))
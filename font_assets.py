@@ -0,0 +1,72 @@
+# font_assets.py
+# Static font instances for the PDF reports.
+# fonts/ ships a variable Noto Serif Devanagari (wght 100-900, wdth 62.5-100).
+# Embedding it as-is drags its variation tables into every PDF subset, and
+# instancing it on the fly takes seconds per weight, so each weight we use is
+# instanced once and kept in fonts/.cache, keyed by the source font's hash.
+import hashlib
+import os
+import tempfile
+import threading
+from functools import lru_cache
+
+from fontTools.ttLib import TTFont
+from fontTools.varLib import instancer
+
+FONT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fonts")
+VARIABLE_FONT = os.path.join(FONT_DIR, "NotoSerifDevanagari-VariableFont_wdth,wght.ttf")
+CACHE_DIR = os.path.join(FONT_DIR, ".cache")
+REGULAR = 400
+BOLD = 700
+
+# one instancing at a time per process: it is slow and memory hungry, and a
+# second thread asking for the same weight can then reuse the first one's file
+_instance_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def _source_hash(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()[:16]
+
+
+def _instance_path(weight, cache_dir):
+    stem = os.path.splitext(os.path.basename(VARIABLE_FONT))[0].split("-")[0]
+    return os.path.join(cache_dir, f"{stem}-w{weight}-{_source_hash(VARIABLE_FONT)}.ttf")
+
+
+@lru_cache(maxsize=None)
+def static_font(weight=REGULAR):
+    """
+    Path to a static instance of the variable font at `weight` (full width).
+    Built on first use and reused from disk afterwards; falls back to the
+    temp dir when fonts/ is read-only.
+    """
+    for cache_dir in (CACHE_DIR, os.path.join(tempfile.gettempdir(), "phc_fonts")):
+        path = _instance_path(weight, cache_dir)
+        if os.path.exists(path):
+            return path
+        with _instance_lock:
+            if os.path.exists(path):
+                return path
+            tmp = None
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                font = instancer.instantiateVariableFont(
+                    TTFont(VARIABLE_FONT), {"wght": weight, "wdth": 100}, updateFontNames=False
+                )
+                # unique name, so other processes building the same file never share it
+                fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+                os.close(fd)
+                font.save(tmp)
+                os.replace(tmp, path)
+                return path
+            except OSError:
+                if tmp and os.path.exists(tmp):
+                    os.remove(tmp)
+                continue
+    # no writable cache at all: use the variable font (default instance is wght 400)
+    return VARIABLE_FONT
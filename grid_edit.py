@@ -0,0 +1,263 @@
+# grid_edit.py
+# Grid editing of a register table: one keyset page in st.data_editor, saved
+# in one transaction. Only the cells that changed are written, grouped into one
+# UPDATE ... FROM (VALUES ...) per set of changed columns, plus one batched
+# INSERT and one batched DELETE.
+# Optimistic concurrency: every write also checks the values the editor
+# started from, so a row someone else changed (or removed) meanwhile is not
+# overwritten; the whole save is rolled back and the conflicting keys reported.
+import time
+
+import pandas as pd
+import streamlit as st
+from psycopg2.extras import execute_values
+
+from db import get_connection, mark_changed
+from record_view import PAGE_SIZES, build_filters, fetch_page, filter_widgets, py_value, quote_ident
+
+
+_CONFLICT_TEXT = {
+    "updated": "edited rows changed or removed by someone else",
+    "deleted": "deleted rows changed or removed by someone else",
+    "inserted": "new rows whose key already exists",
+}
+
+
+class EditConflict(Exception):
+    """Rows that no longer match the grid as loaded: {"updated"|"deleted"|"inserted": [keys]}."""
+
+    def __init__(self, conflicts):
+        self.conflicts = conflicts
+        parts = [f"{_CONFLICT_TEXT[kind]}: {', '.join(map(str, keys))}" for kind, keys in conflicts.items() if keys]
+        super().__init__("; ".join(parts))
+
+
+def diff_rows(original, editor_state, key, columns):
+    """
+    The edits recorded by st.data_editor (`editor_state` from session state:
+    edited_rows and deleted_rows by row position in `original`, added_rows as
+    dicts) as DataFrames. Returns (added, changed, deleted, key_changed): new
+    rows, existing rows with at least one edited cell (with the edits applied),
+    original rows that were removed, and existing rows whose key was edited.
+    Positions are used rather than index labels, which the editor reuses for
+    rows added after a delete.
+    """
+    removed = set(editor_state.get("deleted_rows", []))
+    deleted = original.iloc[sorted(removed)][columns]
+    changed_rows, key_changed_rows = [], []
+    for pos, cells in sorted(editor_state.get("edited_rows", {}).items()):
+        pos = int(pos)
+        if pos in removed:
+            continue
+        before = original.iloc[pos]
+        after = before.copy()
+        for col, val in cells.items():
+            if col in columns:
+                after[col] = val
+        if any(py_value(before[c]) != py_value(after[c]) for c in columns):
+            changed_rows.append(after[columns])
+            if py_value(before[key]) != py_value(after[key]):
+                key_changed_rows.append(after[columns])
+    added = pd.DataFrame(editor_state.get("added_rows", []), columns=columns)
+    # the editor leaves a blank row behind when one is added and left empty
+    added = added[~added.isna().all(axis=1)]
+    return (
+        added,
+        pd.DataFrame(changed_rows, columns=columns),
+        deleted,
+        pd.DataFrame(key_changed_rows, columns=columns),
+    )
+
+
+def cell_changes(original, clean, key, columns):
+    """
+    {key: {column: (old, new)}} for the cells of `clean` (validated rows of
+    existing keys) that differ from `original`; rows with no real change are dropped.
+    """
+    before = original.set_index(key)
+    changes = {}
+    for row in clean.itertuples(index=False):
+        new = row._asdict()
+        k = py_value(new[key])
+        old = before.loc[k]
+        cells = {c: (py_value(old[c]), py_value(new[c])) for c in columns if c != key and py_value(old[c]) != py_value(new[c])}
+        if cells:
+            changes[k] = cells
+    return changes
+
+
+def _column_types(cur, table):
+    cur.execute(
+        "SELECT attname, format_type(atttypid, atttypmod) FROM pg_attribute "
+        "WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped",
+        (table,),
+    )
+    return dict(cur.fetchall())
+
+
+def apply_edits(conn, table, key, columns, inserts, changes, deletes):
+    """
+    Write one grid save in a single transaction:
+      inserts - DataFrame of new rows (`columns`)
+      changes - {key: {column: (old, new)}} from cell_changes
+      deletes - DataFrame of the removed rows as they were loaded
+    Raises EditConflict (after rolling back) when any row no longer matches
+    what was loaded. Returns {"inserted", "updated", "deleted", "seconds"}.
+    """
+    start = time.perf_counter()
+    conflicts = {"deleted": [], "updated": [], "inserted": []}
+    cur = conn.cursor()
+    try:
+        types = _column_types(cur, table)
+        # VALUES rows carry no column types of their own, so cast every slot
+        cast = lambda cols: "(" + ", ".join(f"%s::{types[c]}" for c in cols) + ")"
+        t, qk = quote_ident(table), quote_ident(key)
+        col_list = ", ".join(quote_ident(c) for c in columns)
+
+        if len(deletes):
+            rows = [tuple(py_value(v) for v in r) for r in deletes[columns].itertuples(index=False)]
+            match = " AND ".join(f"t.{quote_ident(c)} IS NOT DISTINCT FROM v.{quote_ident(c)}" for c in columns if c != key)
+            done = execute_values(
+                cur,
+                f"DELETE FROM {t} t USING (VALUES %s) AS v ({col_list}) "
+                f"WHERE t.{qk} = v.{qk} AND {match} RETURNING t.{qk}",
+                rows, template=cast(columns), fetch=True,
+            )
+            conflicts["deleted"] = sorted({r[0] for r in rows} - {r[0] for r in done})
+
+        # one statement per set of changed columns, setting only those cells
+        groups = {}
+        for k, cells in changes.items():
+            groups.setdefault(tuple(sorted(cells)), []).append(k)
+        updated = 0
+        for cols, keys in groups.items():
+            rows = [(k,) + tuple(v for c in cols for v in changes[k][c]) for k in keys]
+            names = [qk] + [quote_ident(f"{p}_{c}") for c in cols for p in ("old", "new")]
+            sets = ", ".join(f"{quote_ident(c)} = v.{quote_ident('new_' + c)}" for c in cols)
+            match = " AND ".join(f"t.{quote_ident(c)} IS NOT DISTINCT FROM v.{quote_ident('old_' + c)}" for c in cols)
+            done = execute_values(
+                cur,
+                f"UPDATE {t} t SET {sets} FROM (VALUES %s) AS v ({', '.join(names)}) "
+                f"WHERE t.{qk} = v.{qk} AND {match} RETURNING t.{qk}",
+                rows, template=cast([key] + [c for c in cols for _ in (0, 1)]), fetch=True,
+            )
+            updated += len(done)
+            conflicts["updated"] += sorted(set(keys) - {r[0] for r in done})
+
+        if len(inserts):
+            rows = [tuple(py_value(v) for v in r) for r in inserts[columns].itertuples(index=False)]
+            done = execute_values(
+                cur,
+                f"INSERT INTO {t} ({col_list}) VALUES %s "
+                f"ON CONFLICT ({qk}) DO NOTHING RETURNING {qk}",
+                rows, template=cast(columns), fetch=True,
+            )
+            conflicts["inserted"] = sorted({r[columns.index(key)] for r in rows} - {r[0] for r in done})
+
+        if any(conflicts.values()):
+            raise EditConflict(conflicts)  # rolled back below
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    return {
+        "inserted": len(inserts),
+        "updated": updated,
+        "deleted": len(deletes),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+# ---------- Grid page ----------
+def _as_text(df):
+    """All-text copy of grid rows for the upload validators (blank for missing)."""
+    return df.astype(object).where(df.notna(), "").map(
+        lambda v: str(int(v)) if isinstance(v, float) and v.is_integer() else str(v)
+    )
+
+
+def render_grid_editor(table, columns, key, filter_kinds, state_key, validate, column_config=None):
+    """
+    One page of `table` (in key order) in st.data_editor. Save writes only the
+    edited cells, added and deleted rows, in one transaction, then reloads once.
+    `validate(text_df)` returns (clean rows, errors), like the bulk import
+    validators.
+    """
+    saved = st.session_state.pop(f"{state_key}_saved", None)
+    if saved:
+        st.success(f"Saved: {saved['updated']} updated, {saved['inserted']} added, "
+                   f"{saved['deleted']} deleted in {saved['seconds']:.2f} s.")
+    filters, kinds = filter_widgets(filter_kinds, state_key)
+    page_size = st.selectbox("Rows per page", PAGE_SIZES, index=1, key=f"{state_key}_size")
+
+    signature = (repr(filters), page_size)
+    if st.session_state.get(f"{state_key}_sig") != signature:
+        st.session_state[f"{state_key}_sig"] = signature
+        st.session_state[f"{state_key}_stack"] = [None]
+    stack = st.session_state[f"{state_key}_stack"]
+    version = st.session_state.setdefault(f"{state_key}_version", 0)
+
+    # the rows as loaded are kept until the next save or page change: they are
+    # both the editor's input and the "before" values checked on save
+    snap_id = (signature, len(stack), stack[-1], version)
+    snap = st.session_state.get(f"{state_key}_snapshot")
+    if snap is None or snap[0] != snap_id:
+        where, params = build_filters(filters, kinds)
+        try:
+            page = fetch_page(table, columns, key, key, False, where, params, stack[-1], page_size)
+        except Exception as e:
+            st.error(f"Failed to load data: {e}")
+            return
+        snap = (snap_id, page.iloc[:page_size].reset_index(drop=True), len(page) > page_size)
+        st.session_state[f"{state_key}_snapshot"] = snap
+    _, original, has_next = snap
+
+    editor_key = f"{state_key}_editor_{len(stack)}_{version}"
+    st.data_editor(original, num_rows="dynamic", hide_index=True, use_container_width=True,
+                   column_config=column_config, key=editor_key)
+    added, changed, deleted, key_changed = diff_rows(original, st.session_state.get(editor_key, {}), key, columns)
+    dirty = len(added) + len(changed) + len(deleted)
+    st.caption(f"{len(changed)} edited, {len(added)} new, {len(deleted)} deleted rows not saved yet"
+               if dirty else "No unsaved changes.")
+
+    next_cursor = (py_value(original[key].iloc[-1]),) * 2 if len(original) else None
+    b1, b2, b3, b4 = st.columns([1, 1, 1, 1])
+    # paging away would drop the edits, so it waits for Save or Discard
+    b1.button("◀ Previous", key=f"{state_key}_prev", disabled=len(stack) == 1 or dirty > 0,
+              on_click=stack.pop)
+    b2.button("Next ▶", key=f"{state_key}_next", disabled=not has_next or dirty > 0,
+              on_click=stack.append, args=(next_cursor,))
+    b3.button("Discard", key=f"{state_key}_discard", disabled=not dirty,
+              on_click=st.session_state.__setitem__, args=(f"{state_key}_version", version + 1))
+    save = b4.button("💾 Save", key=f"{state_key}_save", type="primary", disabled=not dirty)
+
+    if not save:
+        return
+    if len(key_changed):
+        st.error(f"{key} of existing rows cannot be changed ({', '.join(map(str, key_changed[key]))}); "
+                 "delete the row and add a new one instead.")
+        return
+    touched = pd.concat([changed, added])
+    clean, errors = validate(_as_text(touched)) if len(touched) else (touched, pd.DataFrame())
+    if len(errors):
+        st.error("Nothing was saved; fix these rows first.")
+        st.dataframe(errors.drop(columns=["row"], errors="ignore"), use_container_width=True, hide_index=True)
+        return
+    existing = set(py_value(v) for v in changed[key])
+    is_update = clean[key].map(lambda v: py_value(v) in existing)
+    changes = cell_changes(original, clean[is_update], key, columns)
+    try:
+        with get_connection() as conn:
+            result = apply_edits(conn, table, key, columns, clean[~is_update], changes, deleted)
+    except EditConflict as e:
+        st.error(f"Nothing was saved: {e}. Discard to reload the current data, then redo those edits.")
+        return
+    except Exception as e:
+        st.error(f"Save failed (nothing was saved): {e}")
+        return
+    mark_changed(table)
+    st.session_state[f"{state_key}_version"] = version + 1
+    st.session_state[f"{state_key}_saved"] = result
+    st.rerun()
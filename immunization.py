@@ -0,0 +1,186 @@
+# immunization.py
+# Routine immunization due lists. Birth dates are held as one datetime64[D]
+# array and compared with the whole schedule at once: a (children x doses)
+# matrix of due dates gives each dose's status on the chosen date in a single
+# vectorized pass, with no per-child Python loop.
+# The engine (down to due_list) is plain NumPy; the last section loads the
+# children from Postgres and caches the lists and their PDFs.
+import io
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from db import get_connection, table_stamp
+from exports import iter_rows
+from pdf_reports import render_due_list
+
+# (vaccine, due at age in days, last age in days it may still be given)
+# National (UIP) schedule; weeks and months are in days (9 months = 270,
+# 16 months = 487). Edit this table to change the lists.
+SCHEDULE = [
+    ("BCG", 0, 365),
+    ("OPV-0", 0, 15),
+    ("Hep B-0", 0, 1),
+    ("OPV-1", 42, 1826),
+    ("Penta-1", 42, 365),
+    ("Rota-1", 42, 365),
+    ("fIPV-1", 42, 365),
+    ("PCV-1", 42, 365),
+    ("OPV-2", 70, 1826),
+    ("Penta-2", 70, 365),
+    ("Rota-2", 70, 365),
+    ("OPV-3", 98, 1826),
+    ("Penta-3", 98, 365),
+    ("Rota-3", 98, 365),
+    ("fIPV-2", 98, 365),
+    ("PCV-2", 98, 365),
+    ("MR-1", 270, 1826),
+    ("PCV-Booster", 270, 365),
+    ("Vitamin A-1", 270, 1826),
+    ("MR-2", 487, 1826),
+    ("DPT Booster-1", 487, 2556),
+    ("OPV Booster", 487, 1826),
+    ("DPT Booster-2", 1826, 2556),
+    ("Td-10", 3652, 3834),
+    ("Td-16", 5844, 6026),
+]
+# a dose stays "due" this many days after its due date, then turns "overdue"
+GRACE_DAYS = 28
+# "upcoming" looks this far ahead of the chosen date
+HORIZON_DAYS = 28
+
+STATUSES = ("due", "overdue", "upcoming")
+_NONE, _DUE, _OVERDUE, _UPCOMING = 0, 1, 2, 3
+
+
+def schedule_arrays(schedule=SCHEDULE):
+    """Vaccine names, due ages and last ages of `schedule` as aligned arrays."""
+    names = np.array([s[0] for s in schedule], dtype=object)
+    due = np.array([s[1] for s in schedule], dtype="timedelta64[D]")
+    last = np.array([s[2] for s in schedule], dtype="timedelta64[D]")
+    return names, due, last
+
+
+def oldest_age_days(schedule=SCHEDULE):
+    """Children older than this have nothing left on `schedule`."""
+    return max(s[2] for s in schedule)
+
+
+def dose_status(dob, on, schedule=SCHEDULE, grace_days=GRACE_DAYS, horizon_days=HORIZON_DAYS):
+    """
+    Status codes and due dates of every dose for every child, both shaped
+    (len(dob), len(schedule)). On date `on` a dose is
+      due      - due date reached less than `grace_days` ago
+      overdue  - due longer ago than that, but the child is not past its last age
+      upcoming - due date within the next `horizon_days`
+    There is no record of doses given, so overdue means "was due, may still be given".
+    """
+    _, due, last = schedule_arrays(schedule)
+    on = np.datetime64(on, "D")
+    dob = np.asarray(dob, dtype="datetime64[D]")
+    due_at = dob[:, None] + due[None, :]
+    last_at = dob[:, None] + last[None, :]
+    grace = np.timedelta64(grace_days, "D")
+    status = np.select(
+        [
+            (due_at > on) & (due_at <= on + np.timedelta64(horizon_days, "D")),
+            (due_at <= on) & (on < due_at + grace) & (on <= last_at),
+            (due_at + grace <= on) & (on <= last_at),
+        ],
+        [_UPCOMING, _DUE, _OVERDUE],
+        default=_NONE,
+    ).astype(np.int8)
+    return status, due_at
+
+
+def due_list(children, on, schedule=SCHEDULE, statuses=STATUSES,
+             grace_days=GRACE_DAYS, horizon_days=HORIZON_DAYS):
+    """
+    One row per (child, dose) with a status in `statuses` on date `on`.
+    `children` maps id, name, dob, gender, boot_no to aligned arrays (dob as
+    datetime64[D]). Rows are ordered by booth, status, due date and name.
+    """
+    columns = ["id", "name", "dob", "gender", "boot_no", "vaccine", "due_date", "status"]
+    if not len(children["dob"]):
+        return pd.DataFrame(columns=columns)
+    names, _, _ = schedule_arrays(schedule)
+    status, due_at = dose_status(children["dob"], on, schedule, grace_days, horizon_days)
+    wanted = [code for code, s in zip((_DUE, _OVERDUE, _UPCOMING), STATUSES) if s in statuses]
+    child, dose = np.nonzero(np.isin(status, wanted))
+    codes = status[child, dose]
+    dates = due_at[child, dose]
+    booth = np.asarray(children["boot_no"], dtype=object)[child].astype(str)
+    name = np.asarray(children["name"], dtype=object)[child].astype(str)
+    order = np.lexsort((name, dates, codes, booth))
+    child, dose, codes, dates = child[order], dose[order], codes[order], dates[order]
+    return pd.DataFrame({
+        "id": np.asarray(children["id"])[child],
+        "name": np.asarray(children["name"], dtype=object)[child],
+        "dob": np.asarray(children["dob"], dtype="datetime64[D]")[child],
+        "gender": np.asarray(children["gender"], dtype=object)[child],
+        "boot_no": np.asarray(children["boot_no"], dtype=object)[child],
+        "vaccine": names[dose],
+        "due_date": dates,
+        "status": np.array(STATUSES, dtype=object)[codes - 1],
+    }, columns=columns)
+
+
+# ---------- Loading and caching ----------
+def fetch_children(conn, on, booth_no=None):
+    """
+    id, name, dob, gender and boot_no of every child young enough to have a
+    dose left on the schedule on `on`, as aligned arrays (dob as datetime64[D]).
+    """
+    sql = "SELECT id, name, dob, gender, boot_no FROM beneficiaries WHERE dob > %s::date - %s AND dob <= %s::date"
+    params = [on, oldest_age_days(), on]
+    if booth_no:
+        sql += " AND boot_no = %s"
+        params.append(booth_no)
+    parts = [[] for _ in range(5)]
+    for _, rows in iter_rows(conn, sql, params=tuple(params)):
+        for part, col in zip(parts, zip(*rows)):
+            part.extend(col)
+    ids, names, dobs, genders, booths = parts
+    return {
+        "id": np.array(ids, dtype=np.int64),
+        "name": np.array(names, dtype=object),
+        "dob": np.array(dobs, dtype="datetime64[D]"),
+        "gender": np.array(genders, dtype=object),
+        "boot_no": np.array(booths, dtype=object),
+    }
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def _cached_due_list(on, booth_no, statuses, stamp):
+    start = time.perf_counter()
+    with get_connection() as conn:
+        children = fetch_children(conn, on, booth_no)
+    df = due_list(children, on, statuses=statuses)
+    return df, len(children["dob"]), time.perf_counter() - start
+
+
+def build_due_list(on, booth_no=None, statuses=STATUSES):
+    """
+    Doses due, overdue or upcoming on `on` for one booth (or all): returns
+    (DataFrame, children checked, seconds). Cached per date, booth and data
+    version of beneficiaries.
+    """
+    return _cached_due_list(on, booth_no or None, tuple(statuses), table_stamp(["beneficiaries"]))
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def _cached_due_pdf(on, booth_no, statuses, stamp):
+    df, _, _ = _cached_due_list(on, booth_no, statuses, stamp)
+    start = time.perf_counter()
+    out = io.BytesIO()
+    columns = ["name", "dob", "gender", "boot_no", "vaccine", "due_date", "status"]
+    render_due_list(df[columns].itertuples(index=False, name=None), out,
+                    ldate=on.strftime("%d-%m-%Y"), booth_no=booth_no)
+    return out.getvalue(), len(df), time.perf_counter() - start
+
+
+def build_due_pdf(on, booth_no=None, statuses=STATUSES):
+    """Due list as PDF: (pdf bytes, rows, render seconds); cached like build_due_list."""
+    return _cached_due_pdf(on, booth_no or None, tuple(statuses), table_stamp(["beneficiaries"]))
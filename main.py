@@ -1,10 +1,8 @@
 import streamlit as st
-from sqlalchemy import create_engine
+from db import get_engine
 
-db = st.secrets["postgres"]
-engine = create_engine(
-    f"postgresql://{db['user']}:{db['password']}@{db['host']}:{db['port']}/{db['dbname']}"
-)
+# shared connection pool (db.py); created here so the pages start with it ready
+engine = get_engine()
 
 
 # Load Devanagari font
@@ -0,0 +1,21 @@
+# migrate.py
+# One-off schema setup for the indexes the pages rely on (db.INDEXES):
+#
+#   python migrate.py
+#
+# Indexes are built with CREATE INDEX CONCURRENTLY, so this can run against
+# the live database without blocking writes. Safe to re-run.
+import sys
+
+from db import create_indexes
+
+
+def main():
+    results = create_indexes()
+    for name, error in results.items():
+        print(f"{name}: {'ok' if error is None else 'FAILED - ' + error}")
+    return 1 if any(results.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,26 +1,13 @@
 import streamlit as st
 import pandas as pd
-import psycopg2
 from psycopg2.extras import RealDictCursor
-import io
-import json
-import base64
-import time
-import streamlit.components.v1 as components
-
-# Read Postgres secrets from Streamlit secrets.toml
-db = st.secrets["postgres"]
-
-
-def get_connection():
-    return psycopg2.connect(
-        host=db["host"],
-        port=db["port"],
-        dbname=db["dbname"],
-        user=db["user"],
-        password=db["password"],
-        sslmode="require"
-    )
+
+# pooled Postgres connections shared by all pages (see db.py)
+from db import get_connection, render_pool_metrics, cached_read, mark_changed
+from bulk_import import MNO_COLUMNS, read_upload, validate_mno, copy_upsert
+from exports import render_export, build_pdf
+from record_view import render_paged_view, record_picker, fetch_row
+from grid_edit import render_grid_editor
 
 
 # ----------------------
@@ -45,16 +32,15 @@ if not st.session_state["logged_in"]:
             st.error("Please enter a username.")
         else:
             try:
-                conn = get_connection()
-                cur = conn.cursor(cursor_factory=RealDictCursor)
-                # attempt to fetch user role from users table (adjust column names if you use different ones)
-                cur.execute(
-                    "SELECT role FROM users WHERE name = %s OR name = %s LIMIT 1",
-                    (username_input, username_input)
-                )
-                user = cur.fetchone()
-                cur.close()
-                conn.close()
+                with get_connection() as conn:
+                    cur = conn.cursor(cursor_factory=RealDictCursor)
+                    # attempt to fetch user role from users table (adjust column names if you use different ones)
+                    cur.execute(
+                        "SELECT role FROM users WHERE name = %s OR name = %s LIMIT 1",
+                        (username_input, username_input)
+                    )
+                    user = cur.fetchone()
+                    cur.close()
             except Exception as e:
                 st.error(f"Database connection error: {e}")
                 user = None
@@ -75,10 +61,11 @@ else:
     st.sidebar.title(f"Welcome, {st.session_state['username']} ({st.session_state['role']})")
     menu = st.sidebar.radio(
         "Menu",
-        ["Add M No Record", "View M No Records", "Edit / Delete M No Record", "Export / Download", "Generate PDF", "Logout"],
+        ["Add M No Record", "Bulk Import", "View M No Records", "Edit / Delete M No Record", "Grid Edit", "Export / Download", "Generate PDF", "Logout"],
         index=0,
         key="main_menu"
     )
+    render_pool_metrics()
 
     # LOGOUT
     if menu == "Logout":
@@ -108,56 +95,85 @@ else:
                 st.error("Family head name is required.")
             else:
                 try:
-                    conn = get_connection()
-                    cur = conn.cursor()
-                    cur.execute(
-                        f"INSERT INTO m_no_register (m_no, family_head, member, ranjan, balar, taki, dera, freezer, exta_bhandi) VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)",
-                        (int(m_no), family_head.strip(), int(member), int(ranjan), int(balar), int(taki), int(dera), int(frize), int(e_bhandi))
-                    )
-                    conn.commit()
-                    cur.close()
-                    conn.close()
+                    with get_connection() as conn:
+                        cur = conn.cursor()
+                        cur.execute(
+                            f"INSERT INTO m_no_register (m_no, family_head, member, ranjan, balar, taki, dera, freezer, exta_bhandi) VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)",
+                            (int(m_no), family_head.strip(), int(member), int(ranjan), int(balar), int(taki), int(dera), int(frize), int(e_bhandi))
+                        )
+                        conn.commit()
+                        cur.close()
+                        mark_changed("m_no_register")
                     st.success(f"M No {m_no} added successfully!")
                     st.rerun()
                 except Exception as e:
                     st.error(f"Insert failed: {e}")
 
+    # ---------------- Bulk Import ----------------
+    elif menu == "Bulk Import":
+        st.header("Bulk Import M No Records")
+        st.caption("CSV or Excel with columns: " + ", ".join(MNO_COLUMNS) + ". Existing M Nos are updated.")
+        uploaded = st.file_uploader("Upload file", type=["csv", "xlsx"], key="bulk_mno_file")
+
+        if uploaded is not None:
+            try:
+                clean, errors = validate_mno(read_upload(uploaded))
+            except Exception as e:
+                st.error(f"Could not read file: {e}")
+                clean, errors = pd.DataFrame(), pd.DataFrame()
+
+            st.write(f"Valid rows: {len(clean)} — rejected rows: {len(errors)}")
+            if not errors.empty:
+                st.dataframe(errors, use_container_width=True, hide_index=True)
+                st.download_button("⬇️ Download errors", data=errors.to_csv(index=False).encode("utf-8"),
+                                   file_name="m_no_import_errors.csv", mime="text/csv")
+
+            if not clean.empty and st.button(f"Import {len(clean)} rows", key="bulk_mno_go"):
+                try:
+                    with get_connection() as conn:
+                        result = copy_upsert(conn, "m_no_register", clean, "m_no", MNO_COLUMNS)
+                    mark_changed("m_no_register")
+                    st.success(
+                        f"Inserted {result['inserted']}, updated {result['updated']} "
+                        f"in {result['seconds']:.2f} s ({result['rows_per_s']:,.0f} rows/s)."
+                    )
+                except Exception as e:
+                    st.error(f"Import failed (nothing was saved): {e}")
+
     # ---------------- View Family Records ----------------
     elif menu == "View M No Records":
         st.header("M No Records")
-        try:
-            conn = get_connection()
-            df = pd.read_sql(f"SELECT m_no, family_head, member, ranjan, balar, taki, dera, freezer, exta_bhandi FROM m_no_register ORDER BY m_no", conn)
-            conn.close()
-        except Exception as e:
-            st.error(f"Failed to load data: {e}")
-            df = pd.DataFrame()
-
-        if df.empty:
-            st.info("No family records found.")
-        else:
-            st.dataframe(df, use_container_width=True)
+        # filtered, sorted and paged in Postgres; one page of rows per rerun
+        render_paged_view(
+            "m_no_register",
+            ["m_no", "family_head", "member", "ranjan", "balar", "taki", "dera", "freezer", "exta_bhandi"],
+            key="m_no",
+            filter_kinds={"m_no": "number", "family_head": "text"},
+            state_key="mno_view",
+            empty_message="No family records found.",
+        )
 
     # ---------------- Edit / Delete family Record ----------------
     elif menu == "Edit / Delete M No Record":
         st.header("Edit or Delete M No Record")
 
-        try:
-            conn = get_connection()
-            df = pd.read_sql(f"SELECT m_no, family_head, member, ranjan, balar, taki, dera, freezer, exta_bhandi FROM m_no_register ORDER BY m_no", conn)
-            conn.close()
-        except Exception as e:
-            st.error(f"Failed to load data: {e}")
-            df = pd.DataFrame()
+        # typeahead: at most 20 matches, then the chosen row by primary key
+        sel_m_no = record_picker("m_no_register", "m_no", "family_head", "edit_select", "Search by M No or family head")
+        row = None
+        if sel_m_no is not None:
+            try:
+                row = fetch_row(
+                    "m_no_register",
+                    ["m_no", "family_head", "member", "ranjan", "balar", "taki", "dera", "freezer", "exta_bhandi"],
+                    "m_no", sel_m_no,
+                )
+            except Exception as e:
+                st.error(f"Failed to load data: {e}")
 
-        if df.empty:
+        if row is None:
             st.info("No records to edit or delete.")
         else:
-            # create selector labels
-            df["label"] = df["m_no"].astype(str) + " — " + df["family_head"].astype(str)
-            selection = st.selectbox("Select family record", df["label"].tolist(), key="edit_select")
-            sel_m_no = int(selection.split(" — ")[0])
-            row = df[df["m_no"] == sel_m_no].iloc[0]
+            sel_m_no = int(sel_m_no)
 
             # If selection changed, clear other confirmation flags so only current shows
             if "last_selected_rec" not in st.session_state or st.session_state["last_selected_rec"] != sel_m_no:
@@ -190,15 +206,15 @@ else:
                     st.error("Family head name cannot be empty.")
                 else:
                     try:
-                        conn = get_connection()
-                        cur = conn.cursor()
-                        cur.execute(
-                            f"UPDATE m_no_register SET family_head=%s, member=%s, ranjan=%s, balar=%s, taki=%s, dera=%s, freezer=%s, exta_bhandi=%s WHERE m_no=%s",
-                            (edit_family_head.strip(), int(edit_member), int(edit_ranjan), int(edit_balar), int(edit_taki), int(edit_dera), int(edit_frize), int(edit_e_bhandi), sel_m_no)
-                        )
-                        conn.commit()
-                        cur.close()
-                        conn.close()
+                        with get_connection() as conn:
+                            cur = conn.cursor()
+                            cur.execute(
+                                f"UPDATE m_no_register SET family_head=%s, member=%s, ranjan=%s, balar=%s, taki=%s, dera=%s, freezer=%s, exta_bhandi=%s WHERE m_no=%s",
+                                (edit_family_head.strip(), int(edit_member), int(edit_ranjan), int(edit_balar), int(edit_taki), int(edit_dera), int(edit_frize), int(edit_e_bhandi), sel_m_no)
+                            )
+                            conn.commit()
+                            cur.close()
+                            mark_changed("m_no_register")
                         st.success("Record updated successfully.")
                         st.rerun()
                     except Exception as e:
@@ -219,179 +235,67 @@ else:
                 if confirm_chk:
                     if st.button("Confirm Delete", key=f"confirm_del_{sel_m_no}"):
                         try:
-                            conn = get_connection()
-                            cur = conn.cursor()
-                            cur.execute(f"DELETE FROM m_no_register WHERE m_no=%s", (sel_m_no,))
-                            conn.commit()
-                            cur.close()
-                            conn.close()
+                            with get_connection() as conn:
+                                cur = conn.cursor()
+                                cur.execute(f"DELETE FROM m_no_register WHERE m_no=%s", (sel_m_no,))
+                                conn.commit()
+                                cur.close()
+                                mark_changed("m_no_register")
                             st.session_state.pop(flag_name, None)
                             st.success("Record deleted successfully.")
                             st.rerun()
                         except Exception as e:
                             st.error(f"Delete failed: {e}")
 
+    # ---------------- Grid Edit ----------------
+    elif menu == "Grid Edit":
+        st.header("Edit M No Records in a Grid")
+        st.caption("Edit cells, add rows at the bottom or select rows and delete them, then Save once. "
+                   "Rows changed by someone else meanwhile are reported and nothing is saved.")
+        # only edited cells are written, all in one transaction (grid_edit.py)
+        render_grid_editor(
+            "m_no_register", MNO_COLUMNS, key="m_no",
+            filter_kinds={"m_no": "number", "family_head": "text"},
+            state_key="mno_grid", validate=validate_mno,
+            column_config={
+                "m_no": st.column_config.NumberColumn("M-No", min_value=0, step=1, required=True),
+                "family_head": st.column_config.TextColumn("कुटुंब प्रमुखाचे नाव", required=True),
+            },
+        )
+
     # ---------------- Export / Download ----------------
     elif menu == "Export / Download":
         st.header("Export Data")
-        try:
-            conn = get_connection()
-            df = pd.read_sql(f"SELECT m_no, family_head, member, ranjan, balar, taki, dera, freezer, exta_bhandi FROM m_no_register ORDER BY m_no", conn)
-            conn.close()
-        except Exception as e:
-            st.error(f"Failed to load data: {e}")
-            df = pd.DataFrame()
+        # streamed from Postgres into a temp file chunk by chunk; only the finished file is held for the download
+        render_export("SELECT m_no, family_head, member, ranjan, balar, taki, dera, freezer, exta_bhandi FROM m_no_register ORDER BY m_no",
+                      "m_no_register", "m_no_register", "mno_export")
 
-        if df.empty:
-            st.info("No data to export.")
-        else:
-            st.dataframe(df, width='stretch')
-
-            # Excel download
-            towrite = io.BytesIO()
-            with pd.ExcelWriter(towrite, engine="openpyxl") as writer:
-                df.to_excel(writer, index=False, sheet_name="m_no_register")
-            towrite.seek(0)
-            st.download_button(
-                label="⬇️ Download Excel",
-                data=towrite,
-                file_name="m_no_register.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            )
-
-            # CSV download
-            csv = df.to_csv(index=False).encode("utf-8")
-            st.download_button("⬇️ Download CSV", data=csv, file_name="m_no_register.csv", mime="text/csv")
 
     # ---------------- Generate PDF ----------------
     elif menu == "Generate PDF":
         st.header("Generate PDF of Family Records")
 
-        # --- remove inputs: automatically select ALL records ---
+        # all records, rendered on the server (Devanagari shaped by HarfBuzz)
+        query = "SELECT m_no, family_head, member, ranjan, balar, taki, dera, freezer, exta_bhandi FROM m_no_register ORDER BY m_no"
         try:
-            conn = get_connection()
-            query = "SELECT m_no, family_head, member, ranjan, balar, taki, dera, freezer, exta_bhandi FROM m_no_register ORDER BY m_no"
-            df = pd.read_sql(query, conn)
-            conn.close()
-
-            df.insert(0, "Sr No", range(1, len(df) + 1))
+            total = int(cached_read("SELECT count(*) AS n FROM m_no_register", ["m_no_register"])["n"].iloc[0])
         except Exception as e:
             st.error(f"Failed to load data: {e}")
-            df = pd.DataFrame()
+            total = 0
 
-        if df.empty:
+        if total == 0:
             st.info("No data to generate PDF.")
         else:
-            # prepare data for client-side pdfMake
-            df_copy = df.copy().astype(str)  # ensure JSON serializable
-            data_json = df_copy.to_dict(orient="records")
-
-
-
-            # Use pdfMake in an embedded HTML component to create downloadable PDF client-side
-            font_path = "fonts/NotoSerifDevanagari-VariableFont_wdth,wght.ttf"
-            with open(font_path, "rb") as f:
-                font_bytes = f.read()
-                font_b64 = base64.b64encode(font_bytes).decode("utf-8")
-
-            if st.button("Generate PDF") and font_b64:
-                with st.spinner("PDF तयार होत आहे..."):
-                    time.sleep(2)
-
-        components.html(
-            f"""
-            <html>
-            <head>
-              <meta charset='utf-8' />
-              <script src="https://cdnjs.cloudflare.com/ajax/libs/pdfmake/0.1.72/pdfmake.min.js"></script>
-              <script src="https://cdnjs.cloudflare.com/ajax/libs/pdfmake/0.1.72/vfs_fonts.js"></script>
-            </head>
-            <body>
-              <div style="margin-bottom:10px;">
-                <button onclick="previewPDF()" style="padding:8px 12px; background:#2196F3; color:white; border:none; border-radius:6px; cursor:pointer; margin-right:8px;">👁️ Preview PDF</button>
-                <button onclick="downloadPDF()" style="padding:8px 12px; background:#4CAF50; color:white; border:none; border-radius:6px; cursor:pointer;">⬇️ Download PDF</button>
-              </div>
-
-              <script>
-                const data = {json.dumps(data_json, ensure_ascii=False)};
-
-                // inject custom font
-                pdfMake.vfs["CustomFont.ttf"] = "{font_b64}";
-                pdfMake.fonts = {{
-                  MarathiFont: {{
-                    normal: "CustomFont.ttf",
-                    bold: "CustomFont.ttf",
-                    italics: "CustomFont.ttf",
-                    bolditalics: "CustomFont.ttf"
-                  }}
-                }};
-
-                const docDefinition = {{
-                  defaultStyle: {{ font: "MarathiFont" }},
-                  pageMargins: [45, 70, 20, 30],   // space for header/footer
-
-                  header: function(currentPage, pageCount) {{
-                    return {{
-                      margin: [45, 43.5, 20, 0],
-                      table: {{
-                        widths: ['8%','45%','10%','6%','5%','5%','4%','5%', '10%'],
-                        body: [[
-                          {{ text: 'M-No', bold:true, alignment: 'center' }},
-                          {{ text: 'कुटुंब प्रमुखाचे नाव', fontSize: 13, bold:true, alignment: 'center' }},
-                          {{ text: 'ए.सदस्य', fontSize: 13, bold:true, alignment: 'center' }},
-                          {{ text: 'रांजण', fontSize: 13, bold:true, alignment: 'center' }},
-                          {{ text: 'बॅलर', fontSize: 13, bold:true, alignment: 'center' }},
-                          {{ text: 'टाकी', fontSize: 13, bold:true, alignment: 'center' }},
-                          {{ text: 'डेरा', fontSize: 13, bold:true, alignment: 'center' }},
-                          {{ text: 'फ्रिज', fontSize: 13, bold:true, alignment: 'center' }},
-                          {{ text: 'इतर भांडी', fontSize: 13, bold:true, alignment: 'center' }}
-                        ]]
-                      }},
-                    }};
-                  }},
-
-                  footer: function(currentPage, pageCount) {{
-                    return {{
-                      text: currentPage.toString(),
-                      alignment: 'center',
-                      margin: [0, 10, 0, 0],
-                      fontSize: 9
-                    }};
-                  }},
-
-                  content: [
-                    {{
-                      table: {{
-                        widths: ['8%','45%','10%','6%','5%','5%','4%','5%', '10%'],
-                        body: [
-                          ...data.map(d => [
-                            {{ text: d['m_no'], alignment: 'center' }},
-                            {{ text: d['family_head'] }},
-                            {{ text: d['member'], alignment: 'center' }},
-                            {{ text: d['ranjan'], alignment: 'center' }},
-                            {{ text: d['balar'], alignment: 'center' }},
-                            {{ text: d['taki'], alignment: 'center' }},
-                            {{ text: d['dera'], alignment: 'center' }},
-                            {{ text: d['freezer'], alignment: 'center' }},
-                            {{ text: d['exta_bhandi'], alignment: 'center' }}
-                          ])
-                        ]
-                      }}
-                    }}
-                  ]
-                }};
-
-                function previewPDF() {{
-                  pdfMake.createPdf(docDefinition).open();
-                }}
-
-                function downloadPDF() {{
-                  pdfMake.createPdf(docDefinition).download('m_no_register.pdf');
-                }}
-              </script>
-            </body>
-            </html>
-            """,
-            height=700,
-            scrolling=True
-        )
+            st.write(f"{total} records")
+            if st.button("Generate PDF"):
+                st.session_state["mno_pdf_ready"] = True
+
+            if st.session_state.get("mno_pdf_ready"):
+                try:
+                    with st.spinner("PDF तयार होत आहे..."):
+                        pdf, seconds = build_pdf("mno", query, ["m_no_register"])
+                    st.success(f"✅ PDF तयार झाला! ({len(pdf) / 1024:.0f} KB, {seconds:.1f} s)")
+                    st.download_button("⬇️ Download PDF", data=pdf, file_name="m_no_register.pdf",
+                                       mime="application/pdf", on_click="ignore")
+                except Exception as e:
+                    st.error(f"PDF generation failed: {e}")
@@ -1,43 +1,84 @@
 # app.py
 import streamlit as st
-import pandas as pd
+import os
+import threading
+import time
 import html
-from rapidfuzz import fuzz   # pip install rapidfuzz
+import io
+import numpy as np
+import pandas as pd
+from screening_sqlite import build_sqlite, is_current, search_sqlite
+from screening_search import SCREENING_COLS, MIN_TRIGRAM_OVERLAP, MIN_CANDIDATES, ResultCache, normalize_query, load_screening_data, memory_report, score_query, score_queries, search_scores, top_n_indices, exact_matches, pending_summary, pending_worklist
 
 # CONFIG
 EXCEL_FILENAME = "Shelgaon.xlsx"  # place your Excel file in project folder with this name
 TOP_N = 15
+# search-as-you-type: when the query only grows, rescore rows that scored at least this
+INCREMENTAL_MIN_SCORE = 50
+# wait this long before a full scan so fast typing does not queue scans
+SEARCH_DEBOUNCE_S = 0.15
+# batch lookup: names scored per cdist call (bounds the score matrix size)
+BATCH_CHUNK = 50
+# SQLite backend (build with: python screening_sqlite.py build)
+SQLITE_FILENAME = "Shelgaon.sqlite"
+# searches remembered for all users (per workbook version)
+RESULT_CACHE_SIZE = 2048
+PANDAS_BACKEND = "In memory (pandas)"
+SQLITE_BACKEND = "On disk (SQLite FTS5)"
 
 st.set_page_config(page_title="Name search - Screening statuses (Top 15 matches)", layout="wide")
 st.title("Search Person & show Screening Status (Top 15 matches)")
 
 st.info("Search Now...")
 
+@st.cache_resource(max_entries=1)
+def load_df_from_project(path, mtime=None):
+    # one read-only dataset per process, shared by every session (no per-rerun copies);
+    # `mtime` is only part of the cache key, so an edited workbook is reloaded
+    # Excel is parsed only when the Parquet sidecar is missing or stale
+    return load_screening_data(path, version=mtime)
+
+@st.cache_data
+def load_pending_summary(path, mtime=None):
+    # computed once per workbook version (mtime), not on every rerun
+    data = load_df_from_project(path, mtime)
+    return pending_summary(data.df), pending_worklist(data.df)
+
 @st.cache_data
-def load_df_from_project(path):
-    # read everything as string to avoid NaNs; if file missing, raise
-    df = pd.read_excel(path, dtype=str).fillna("")
-    # ensure name columns exist
-    for c in ["First Name", "Middle Name", "Last Name"]:
-        if c not in df.columns:
-            df[c] = ""
-        df[c] = df[c].astype(str).str.strip()
-    # build normalized full name string (single spaces)
-    df["_full"] = (
-        df["First Name"].str.strip() + " " +
-        df["Middle Name"].str.strip() + " " +
-        df["Last Name"].str.strip()
-    ).str.split().str.join(" ")
-    # lowercase helpers for exact-equality checks
-    df["_full_lc"] = df["_full"].str.casefold()
-    df["_first_lc"] = df["First Name"].str.casefold()
-    df["_middle_lc"] = df["Middle Name"].str.casefold()
-    df["_last_lc"] = df["Last Name"].str.casefold()
-    return df
+def worklist_csv(path, mtime, village):
+    _, worklist = load_pending_summary(path, mtime)
+    if village is not None:
+        worklist = worklist[worklist["Village"] == village]
+    return worklist.to_csv(index=False).encode("utf-8")
+
+@st.cache_data
+def load_memory_report(path, mtime=None):
+    return memory_report(load_df_from_project(path, mtime).df)
+
+menu = st.sidebar.radio(
+    "Menu",
+    ["Search one person", "Batch lookup (upload list)", "Pending summary", "Dataset info"],
+    index=0,
+    key="screening_menu"
+)
+
+# search backend: in-memory pandas, or SQLite/FTS5 on disk (keeps the sheet out of memory)
+backend = st.sidebar.radio("Search backend", [PANDAS_BACKEND, SQLITE_BACKEND], index=0, key="search_backend")
+use_sqlite = menu == "Search one person" and backend == SQLITE_BACKEND
+
+@st.cache_resource
+def get_result_cache():
+    # one LRU of search results for the whole process (all sessions)
+    return ResultCache(maxsize=RESULT_CACHE_SIZE)
+
+result_cache = get_result_cache()
 
 # try load
+data = None
 try:
-    df = load_df_from_project(EXCEL_FILENAME)
+    data_mtime = os.path.getmtime(EXCEL_FILENAME)
+    if not use_sqlite:
+        data = load_df_from_project(EXCEL_FILENAME, data_mtime)
 except FileNotFoundError:
     st.error(f"Could not find file `{EXCEL_FILENAME}` in the app folder. Please add the Excel file and restart the app.")
     st.stop()
@@ -45,33 +86,34 @@ except Exception as e:
     st.error(f"Error reading `{EXCEL_FILENAME}`: {e}")
     st.stop()
 
+@st.cache_resource
+def get_sqlite_build_lock():
+    # one SQLite build at a time for the whole process (all sessions)
+    return threading.Lock()
 
-# input
-query_raw = st.text_input("Enter name to search (full / first+middle / middle+last)", "")
-query = query_raw.strip()
-query_lc = query.casefold()
+if use_sqlite:
+    rebuild = st.sidebar.button("Rebuild SQLite index", key="sqlite_rebuild")
+    if rebuild or not is_current(EXCEL_FILENAME, SQLITE_FILENAME):
+        with st.spinner(f"Building `{SQLITE_FILENAME}` from `{EXCEL_FILENAME}`..."):
+            try:
+                with get_sqlite_build_lock():
+                    # another session may have finished the build while we waited
+                    if rebuild or not is_current(EXCEL_FILENAME, SQLITE_FILENAME):
+                        build_sqlite(EXCEL_FILENAME, SQLITE_FILENAME)
+            except Exception as e:
+                st.error(f"Could not build `{SQLITE_FILENAME}`: {e}")
+                st.stop()
 
-# columns to display
-screening_cols = [
-    "HTN_Screening_Status",
-    "DM_Screening_Status",
-    "OC_Screening_Status",
-    "BC_Screening_Status",
-    "CC_Screening_Status"
-]
-for col in screening_cols:
-    if col not in df.columns:
-        df[col] = ""
+df = data.df if data is not None else None
+variants = data.variants if data is not None else None
 
+# columns to display
+screening_cols = SCREENING_COLS
 context_cols = ["First Name", "Middle Name", "Last Name", "Age", "Sex", "Village", "Mobile #"]
 
-def make_display_name(row):
-    name = " ".join([s for s in [row.get("First Name",""), row.get("Middle Name",""), row.get("Last Name","")] if s])
-    village = str(row.get("Village","")).strip()
-    extra = ""
-    if village:
-        extra += f" — {village}"
-    return f"{name}{extra}"
+def cell_text(val):
+    # Age is numeric now; show missing values as blank like before
+    return "" if pd.isna(val) else str(val)
 
 def color_cell(val):
     text = html.escape(str(val))
@@ -79,144 +121,259 @@ def color_cell(val):
         return f"<span style='color:red; font-weight:700'>{text}</span>"
     return text
 
-# ---------- Improved matching routine ----------
-def compute_best_score_for_row(row, query, query_lc):
+def incremental_search(query, query_lc):
     """
-    Build several name variants for a row and compute similarity scores.
-    Return final score (0-100).
+    Top-N row positions and their scores, reusing this session's previous
+    search: same query -> previous result, longer query -> rescore only the
+    rows that scored at least INCREMENTAL_MIN_SCORE last time.
+    Returns (top_idx, top_scores, full); full is False when the result came
+    from that rescoring, which depends on what this session typed before and
+    so must not be shared with other sessions.
     """
-    # Candidate name strings (raw)
-    full = str(row["_full"]).strip()
-    first = str(row["First Name"]).strip()
-    middle = str(row["Middle Name"]).strip()
-    last = str(row["Last Name"]).strip()
-
-    # If First Name contains multiple tokens, treat them as possible first+middle
-    first_tokens = [t for t in first.split() if t]
-    first_variants = []
-    if first_tokens:
-        # e.g. if First = "Ram Kumar", variants: "Ram", "Ram Kumar"
-        for i in range(1, len(first_tokens)+1):
-            first_variants.append(" ".join(first_tokens[:i]))
-    else:
-        first_variants.append(first)
-
-    # Build candidate strings to compare with query
-    candidates = set()
-    # full
-    if full:
-        candidates.add(full)
-    # first + middle (if middle exists)
-    if first and middle:
-        candidates.add((first + " " + middle).strip())
-    # first variants + last
-    if last:
-        for fv in first_variants:
-            if fv:
-                candidates.add((fv + " " + last).strip())
-    # first only and middle+last (if middle exists)
-    candidates.add(first)
-    if middle and last:
-        candidates.add((middle + " " + last).strip())
-    # also add middle and last alone
-    if middle:
-        candidates.add(middle)
-    if last:
-        candidates.add(last)
-
-    # compute similarity scores
-    scores = []
-    exact_match_found = False
-    for cand in candidates:
-        if not cand:
-            continue
-        cand_lc = cand.casefold()
-        # exact equality (case-insensitive) -> huge boost
-        if cand_lc == query_lc and query_lc != "":
-            exact_match_found = True
-            scores.append(100.0)
-            continue
-        # else compute WRatio (good general-purpose)
-        try:
-            s = fuzz.WRatio(query, cand)  # 0-100
-        except Exception:
-            s = 0.0
-        scores.append(s)
-
-    # if nothing scored (empty candidates) return 0
-    if not scores:
-        base = 0.0
+    state = st.session_state.get("search_state")
+    if state is None or state["data"] != data_mtime:
+        state = None
+    if state is not None and state["query"] == query:
+        return state["top_idx"], state["top_scores"], state["full"]
+
+    full = not (state is not None and query.startswith(state["query"]) and len(state["rows"]) >= MIN_CANDIDATES)
+    if not full:
+        scores = score_query(variants, query, query_lc, rows=state["rows"])
     else:
-        base = max(scores)
-
-    # slight boost if query is substring of full name or vice-versa
-    try:
-        if query_lc and query_lc in str(row["_full_lc"]):
-            base = max(base, 90.0)
-        if row["_full_lc"] and row["_full_lc"] in query_lc:
-            base = max(base, 90.0)
-    except Exception:
-        pass
-
-    # final boost for exact match
-    if exact_match_found:
-        final = 100.0
+        # debounce: if another keystroke arrives while we wait, Streamlit stops
+        # this run at the next element call and the full scan never starts
+        time.sleep(SEARCH_DEBOUNCE_S)
+        st.empty()
+        # compute best score per row (one batched call over the candidate rows' name variants)
+        scores = search_scores(variants, data.trigrams, query, query_lc, MIN_TRIGRAM_OVERLAP, MIN_CANDIDATES)
+
+    # pick top N by score (then by name tie-breaker)
+    top_idx = top_n_indices(scores, data.full, TOP_N)
+    st.session_state["search_state"] = {
+        "data": data_mtime,
+        "query": query,
+        "rows": np.flatnonzero(scores >= INCREMENTAL_MIN_SCORE),
+        "top_idx": top_idx,
+        "top_scores": scores[top_idx],
+        "full": full,
+    }
+    return top_idx, scores[top_idx], full
+
+# ---------------- Search one person ----------------
+if menu == "Search one person":
+    # input
+    query_raw = st.text_input("Enter name to search (full / first+middle / middle+last) or mobile number", "")
+    query = normalize_query(query_raw)
+    query_lc = query.casefold()
+
+    if query:
+        # same query from any session on the same workbook version -> cached result
+        cache_key = (backend, query)
+        cached = result_cache.get(cache_key, data_mtime)
+        if use_sqlite:
+            if cached is None:
+                # FTS5 candidates re-ranked with rapidfuzz; only the top rows come back
+                cached = search_sqlite(SQLITE_FILENAME, query, query_lc, TOP_N)
+                result_cache.put(cache_key, data_mtime, cached)
+            top_rows, top_scores = cached
+            top_display = top_rows["_display"].tolist() if len(top_rows) else []
+        else:
+            if cached is None:
+                # phone number / exact full name -> hash lookup; fuzzy search only without a hit
+                exact = exact_matches(data, query, query_lc, TOP_N)
+                # row positions + scores only; the shared frame is never changed
+                if exact is not None:
+                    cached, shareable = exact, True
+                else:
+                    top_idx, top_scores, shareable = incremental_search(query, query_lc)
+                    cached = (top_idx, top_scores)
+                # incremental rescoring is approximate and session-specific: keep it out of the shared cache
+                if shareable:
+                    result_cache.put(cache_key, data_mtime, cached)
+            top_idx, top_scores = cached
+            top_rows = df.iloc[top_idx]
+            # display names are precomputed at load
+            top_display = data.display[top_idx]
+        # filter out very low scores (optional) - comment out if you prefer always TOP_N
+        # keep = top_scores >= 25; top_rows, top_scores, top_display = top_rows[keep], top_scores[keep], np.asarray(top_display)[keep]  # uncomment to require minimum similarity
+
+        if len(top_rows) == 0:
+            st.info("No related names found.")
+            st.stop()
+
+        # Show list with similarity score
+        st.markdown(f"**Top {len(top_rows)} matches (sorted by computed similarity):**")
+        # create options with score
+        options = [f"{name}  —  {int(score)}% " for name, score in zip(top_display, top_scores)]
+        # select by position so two people with the same name/village stay distinct
+        selected = st.selectbox("Select a person", options=range(len(options)), format_func=lambda i: options[i])
+        sel_row = top_rows.iloc[selected]
+
+        # Show basic info
+        st.subheader("Selected person")
+        info_html = "<table style='border-collapse: collapse;'>"
+        for c in context_cols:
+            info_html += f"<tr><td style='padding:4px 8px; font-weight:600'>{html.escape(c)}</td><td style='padding:4px 8px'>{html.escape(cell_text(sel_row.get(c,'')))}</td></tr>"
+        info_html += "</table>"
+        st.markdown(info_html, unsafe_allow_html=True)
+
+        # Screening statuses
+        st.subheader("Screening Statuses")
+        headers = ["Screening"] + screening_cols
+        table_html = "<table style='border-collapse: collapse; width:100%'>"
+        table_html += "<tr>" + "".join([f"<th style='border:1px solid #ddd; padding:6px; text-align:left'>{html.escape(h)}</th>" for h in headers]) + "</tr>"
+        row_cells = [f"<td style='border:1px solid #ddd; padding:6px'>Selected</td>"]
+        for c in screening_cols:
+            row_cells.append(f"<td style='border:1px solid #ddd; padding:6px'>{color_cell(sel_row.get(c,''))}</td>")
+        table_html += "<tr>" + "".join(row_cells) + "</tr>"
+        table_html += "</table>"
+        st.markdown(table_html, unsafe_allow_html=True)
+        st.caption("`Pending Screening` statuses are highlighted in red.")
     else:
-        final = min(100.0, base)
+        st.info("Type a name to get the top related 15 matches.")
+
+# ---------------- Batch lookup ----------------
+elif menu == "Batch lookup (upload list)":
+    st.header("Batch lookup")
+    st.caption("Upload a CSV / Excel list of names (optionally with village). Every name is matched against the screening file.")
+    uploaded = st.file_uploader("Names file", type=["csv", "xlsx"], key="batch_file")
 
-    return final
+    if uploaded is not None:
+        try:
+            if uploaded.name.lower().endswith(".csv"):
+                names_df = pd.read_csv(uploaded, dtype=str).fillna("")
+            else:
+                names_df = pd.read_excel(uploaded, dtype=str).fillna("")
+        except Exception as e:
+            st.error(f"Could not read `{uploaded.name}`: {e}")
+            st.stop()
 
-# ---------- End improved matching ----------
+        if names_df.empty:
+            st.info("The uploaded file has no rows.")
+            st.stop()
 
-if query:
-    # prepare display names
-    df["__display"] = df.apply(make_display_name, axis=1)
+        cols = list(names_df.columns)
+        lower = [str(c).strip().casefold() for c in cols]
+        name_col = st.selectbox("Name column", cols, index=lower.index("name") if "name" in lower else 0, key="batch_name_col")
+        village_opts = ["(none)"] + cols
+        village_col = st.selectbox(
+            "Village column (optional)",
+            village_opts,
+            index=village_opts.index(cols[lower.index("village")]) if "village" in lower else 0,
+            key="batch_village_col"
+        )
 
-    # compute best score per row
-    scores = []
-    for idx, row in df.iterrows():
-        s = compute_best_score_for_row(row, query, query_lc)
-        scores.append(s)
-    df["_score"] = scores
+        batch_key = (uploaded.file_id, name_col, village_col, data_mtime)
+        if st.button("Match all names", key="batch_run"):
+            names = names_df[name_col].astype(str).str.strip().tolist()
+            in_villages = names_df[village_col].astype(str).str.strip().tolist() if village_col != "(none)" else [""] * len(names)
+            full_arr = data.full
+            village_lc = df["Village"].astype(str).str.casefold() if "Village" in df.columns else None
+            village_masks = {}
 
-    # pick top N by score (then by name tie-breaker)
-    top_df = df.sort_values(by=["_score", "_full"], ascending=[False, True]).head(TOP_N).copy()
-    # filter out very low scores (optional) - comment out if you prefer always TOP_N
-    # top_df = top_df[top_df["_score"] >= 25]  # uncomment to require minimum similarity
-
-    if top_df.empty:
-        st.info("No related names found.")
-        st.stop()
-
-    # Show list with similarity score
-    st.markdown(f"**Top {len(top_df)} matches (sorted by computed similarity):**")
-    # create options with score
-    options = [f"{row['__display']}  —  {int(row['_score'])}% " for _, row in top_df.iterrows()]
-    selected_opt = st.selectbox("Select a person", options=options)
-
-    # find corresponding display string (strip trailing score)
-    selected_display = selected_opt.rsplit("  —  ", 1)[0]
-    sel_row = top_df[top_df["__display"] == selected_display].iloc[0]
-
-    # Show basic info
-    st.subheader("Selected person")
-    info_html = "<table style='border-collapse: collapse;'>"
-    for c in context_cols:
-        info_html += f"<tr><td style='padding:4px 8px; font-weight:600'>{html.escape(c)}</td><td style='padding:4px 8px'>{html.escape(str(sel_row.get(c,'')))}</td></tr>"
-    info_html += "</table>"
-    st.markdown(info_html, unsafe_allow_html=True)
-
-    # Screening statuses
-    st.subheader("Screening Statuses")
-    headers = ["Screening"] + screening_cols
-    table_html = "<table style='border-collapse: collapse; width:100%'>"
-    table_html += "<tr>" + "".join([f"<th style='border:1px solid #ddd; padding:6px; text-align:left'>{html.escape(h)}</th>" for h in headers]) + "</tr>"
-    row_cells = [f"<td style='border:1px solid #ddd; padding:6px'>Selected</td>"]
-    for c in screening_cols:
-        row_cells.append(f"<td style='border:1px solid #ddd; padding:6px'>{color_cell(sel_row.get(c,''))}</td>")
-    table_html += "<tr>" + "".join(row_cells) + "</tr>"
-    table_html += "</table>"
-    st.markdown(table_html, unsafe_allow_html=True)
-    st.caption("`Pending Screening` statuses are highlighted in red.")
-else:
-    st.info("Type a name to get the top related 15 matches.")
+            report = []
+            progress = st.progress(0.0, text="Matching...")
+            live = st.empty()
+            started = time.time()
+            for start in range(0, len(names), BATCH_CHUNK):
+                chunk = names[start:start + BATCH_CHUNK]
+                # one multi-threaded cdist call per chunk of names
+                chunk_scores = score_queries(variants, chunk)
+                for i, name in enumerate(chunk):
+                    scores = chunk_scores[i]
+                    village = in_villages[start + i]
+                    # prefer people from the given village when there are any
+                    # (sheet villages look like "Shelgaon  (31885)", so match by substring)
+                    if village and village_lc is not None:
+                        if village not in village_masks:
+                            village_masks[village] = village_lc.str.contains(village.casefold(), regex=False).to_numpy()
+                        in_village = village_masks[village]
+                        if in_village.any():
+                            scores = np.where(in_village, scores, -1.0)
+                    best = top_n_indices(scores, full_arr, 1) if name else []
+                    rec = {"Input Name": name, "Input Village": village}
+                    if len(best):
+                        hit = df.iloc[best[0]]
+                        rec["Matched Name"] = hit["_full"]
+                        rec["Score"] = int(scores[best[0]])
+                        for c in ["Village", "Mobile #", "Age", "Sex"] + screening_cols:
+                            rec[c] = hit.get(c, "")
+                    else:
+                        rec["Matched Name"] = ""
+                        rec["Score"] = 0
+                    report.append(rec)
+                done = min(start + BATCH_CHUNK, len(names))
+                progress.progress(done / len(names), text=f"Matched {done} / {len(names)} names")
+                live.dataframe(pd.DataFrame(report), width="stretch")
+            elapsed = time.time() - started
+            progress.progress(1.0, text=f"Matched {len(names)} names in {elapsed:.1f} s")
+            st.session_state["batch_report"] = (batch_key, pd.DataFrame(report))
+
+        saved = st.session_state.get("batch_report")
+        if saved is not None and saved[0] == batch_key:
+            report_df = saved[1]
+            st.dataframe(report_df, width="stretch")
+
+            # Excel download
+            towrite = io.BytesIO()
+            with pd.ExcelWriter(towrite, engine="openpyxl") as writer:
+                report_df.to_excel(writer, index=False, sheet_name="batch_lookup")
+            towrite.seek(0)
+            st.download_button(
+                label="⬇️ Download Excel",
+                data=towrite,
+                file_name="screening_batch_lookup.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            )
+
+            # CSV download
+            csv = report_df.to_csv(index=False).encode("utf-8")
+            st.download_button("⬇️ Download CSV", data=csv, file_name="screening_batch_lookup.csv", mime="text/csv")
+
+# ---------------- Pending summary ----------------
+elif menu == "Pending summary":
+    st.header("Pending Screening summary")
+    summary, worklist = load_pending_summary(EXCEL_FILENAME, data_mtime)
+    st.caption("Number of people with `Pending Screening`, per village and screening type.")
+    st.dataframe(summary, width="stretch")
+
+    st.subheader("Village worklist")
+    villages = [v for v in summary.index if v != "Total"]
+    if not villages:
+        st.info("No villages found in the screening file.")
+    else:
+        village = st.selectbox("Village", villages, key="worklist_village")
+        village_list = worklist[worklist["Village"] == village]
+        st.markdown(f"**{len(village_list)} people with at least one pending screening**")
+        st.dataframe(village_list, width="stretch")
+        st.download_button(
+            "⬇️ Download village worklist (CSV)",
+            data=worklist_csv(EXCEL_FILENAME, data_mtime, village),
+            file_name=f"pending_{village.split('(')[0].strip()}.csv",
+            mime="text/csv"
+        )
+        st.download_button(
+            "⬇️ Download all villages (CSV)",
+            data=worklist_csv(EXCEL_FILENAME, data_mtime, None),
+            file_name="pending_all_villages.csv",
+            mime="text/csv"
+        )
+
+# ---------------- Dataset info ----------------
+elif menu == "Dataset info":
+    st.header("Dataset info")
+    st.markdown(f"**{len(df)} people, {len(df.columns)} columns** loaded from `{EXCEL_FILENAME}`")
+    report = load_memory_report(EXCEL_FILENAME, data_mtime)
+    before = report.loc["Total", "Object strings (bytes)"]
+    after = report.loc["Total", "Loaded (bytes)"]
+    st.metric("Memory (loaded)", f"{after / 1e6:.1f} MB", delta=f"{after / 1e6 - before / 1e6:.1f} MB vs. all text columns", delta_color="inverse")
+    st.caption("Bytes per column as loaded (categorical / Arrow string / numeric) compared with reading every column as Python strings.")
+    st.dataframe(report, width="stretch")
+
+    st.subheader("Search result cache")
+    stats = result_cache.stats()
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Cached searches", f"{stats['entries']} / {stats['max entries']}")
+    c2.metric("Hits", stats["hits"])
+    c3.metric("Misses", stats["misses"])
+    c4.metric("Hit rate", f"{stats['hit rate']:.0%}")
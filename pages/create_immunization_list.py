@@ -1,27 +1,20 @@
 import streamlit as st
 import pandas as pd
-import psycopg2
 from psycopg2.extras import RealDictCursor
 from datetime import date
-import io
-import json
-import base64
-import time
-import streamlit.components.v1 as components
 
 
 
-db = st.secrets["postgres"]
+# pooled Postgres connections shared by all pages (see db.py)
+from db import get_connection, render_pool_metrics, mark_changed, warn_missing_indexes, BOOTH_DOB_INDEX
+from bulk_import import GENDER_CODES, normalize_gender, count_upload_rows, iter_upload_chunks, load_beneficiaries
+from exports import (render_export, build_pdf, build_booth_zip, booth_list_query, count_eligible,
+                     check_booth_plan, AGE_MAX_YEARS, PLAN_CHECK_MIN_ROWS, PREVIEW_ROWS)
+from immunization import STATUSES as DUE_STATUSES, build_due_list, build_due_pdf
+from record_view import render_paged_view, record_picker, fetch_row
 
-def get_connection():
-    return psycopg2.connect(
-        host=db["host"],
-        port=db["port"],
-        dbname=db["dbname"],
-        user=db["user"],
-        password=db["password"],
-        sslmode="require"
-    )
+# rejected rows kept for the bulk enrolment report
+MAX_ERROR_ROWS = 1000
 
 # ----------------------
 # Session init
@@ -45,16 +38,15 @@ if not st.session_state["logged_in"]:
             st.error("Please enter a username.")
         else:
             try:
-                conn = get_connection()
-                cur = conn.cursor(cursor_factory=RealDictCursor)
-                # Check both possible column names (username or name)
-                cur.execute(
-                    "SELECT role FROM users WHERE name = %s OR name = %s LIMIT 1",
-                    (username_input, username_input)
-                )
-                user = cur.fetchone()
-                cur.close()
-                conn.close()
+                with get_connection() as conn:
+                    cur = conn.cursor(cursor_factory=RealDictCursor)
+                    # Check both possible column names (username or name)
+                    cur.execute(
+                        "SELECT role FROM users WHERE name = %s OR name = %s LIMIT 1",
+                        (username_input, username_input)
+                    )
+                    user = cur.fetchone()
+                    cur.close()
             except Exception as e:
                 st.error(f"Database connection error: {e}")
                 user = None
@@ -75,10 +67,11 @@ else:
     st.sidebar.title(f"Welcome, {st.session_state['username']} ({st.session_state['role']})")
     menu = st.sidebar.radio(
         "Menu",
-        ["Add Beneficiary", "View Beneficiaries", "Edit / Delete Beneficiary", "Export / Download", "Generate PDF", "Logout"],
+        ["Add Beneficiary", "Bulk Enrol", "View Beneficiaries", "Edit / Delete Beneficiary", "Export / Download", "Generate PDF", "Logout"],
         index=0,
         key="main_menu"
     )
+    render_pool_metrics()
 
     # LOGOUT
     if menu == "Logout":
@@ -93,7 +86,7 @@ else:
         with st.form("add_ben_form", clear_on_submit=True):
             name = st.text_input("Name", key="add_name")
             birthdate = st.date_input("Birth Date", value=date.today(), key="add_dob")
-            gender = st.selectbox("Gender", ["M", "F", "O"], key="add_gender")
+            gender = st.selectbox("Gender", GENDER_CODES, key="add_gender")
             booth_no = st.text_input("Booth NO:", key="add_booth_no")
 
             submit = st.form_submit_button("Add")
@@ -103,60 +96,92 @@ else:
                 st.error("Name is required.")
             else:
                 try:
-                    conn = get_connection()
-                    cur = conn.cursor()
-                    cur.execute(
-                        "INSERT INTO beneficiaries (name, dob, gender, boot_no) VALUES (%s,%s,%s, %s)",
-                        (name.strip(), birthdate, gender, booth_no)
-                    )
-                    conn.commit()
-                    cur.close()
-                    conn.close()
+                    with get_connection() as conn:
+                        cur = conn.cursor()
+                        cur.execute(
+                            "INSERT INTO beneficiaries (name, dob, gender, boot_no) VALUES (%s,%s,%s, %s)",
+                            (name.strip(), birthdate, gender, booth_no)
+                        )
+                        conn.commit()
+                        cur.close()
+                        mark_changed("beneficiaries")
                     st.success(f"{name} added successfully!")
                 except Exception as e:
                     st.error(f"Insert failed: {e}")
 
+    # ---------------- Bulk Enrol ----------------
+    elif menu == "Bulk Enrol":
+        st.header("Bulk Enrol Beneficiaries")
+        warn_missing_indexes([BOOTH_DOB_INDEX], "The duplicate check")
+        st.caption(
+            "CSV or Excel with columns: name, dob, gender, boot_no. Dates may be DD-MM-YYYY or Excel dates; "
+            "gender M/F/O or Male/Female/Other. Children already enrolled (same name, dob and booth) are skipped."
+        )
+        uploaded = st.file_uploader("Upload booth list", type=["csv", "xlsx"], key="bulk_ben_file")
+
+        if uploaded is not None and st.button("Start enrolment", key="bulk_ben_go"):
+            total_rows = count_upload_rows(uploaded)
+            progress = st.progress(0.0, text="Starting…")
+            status = st.empty()
+            error_parts, kept_errors = [], 0
+            result = None
+            try:
+                with get_connection() as conn:
+                    for result in load_beneficiaries(conn, iter_upload_chunks(uploaded)):
+                        # keep at most MAX_ERROR_ROWS rejected rows for the report
+                        if kept_errors < MAX_ERROR_ROWS and len(result["errors"]):
+                            part = result["errors"].head(MAX_ERROR_ROWS - kept_errors)
+                            error_parts.append(part)
+                            kept_errors += len(part)
+                        progress.progress(min(result["rows"] / total_rows, 1.0),
+                                          text=f"{result['rows']:,} of ~{total_rows:,} rows")
+                        status.write(
+                            f"Inserted {result['inserted']:,} — duplicates skipped {result['duplicates']:,} — "
+                            f"rejected {result['rejected']:,} ({result['rows_per_s']:,.0f} rows/s)"
+                        )
+                progress.progress(1.0, text="Done")
+            except Exception as e:
+                st.error(f"Enrolment stopped: {e}. Batches already loaded are saved; re-uploading skips them.")
+            finally:
+                if result is not None:
+                    mark_changed("beneficiaries")
+
+            if error_parts:
+                errors = pd.concat(error_parts, ignore_index=True)
+                st.dataframe(errors, use_container_width=True, hide_index=True)
+                st.download_button("⬇️ Download rejected rows", data=errors.to_csv(index=False).encode("utf-8"),
+                                   file_name="enrolment_errors.csv", mime="text/csv", on_click="ignore")
+
     # ---------------- View Beneficiaries ----------------
     elif menu == "View Beneficiaries":
         st.header("Beneficiaries List")
-        try:
-            conn = get_connection()
-            df = pd.read_sql("SELECT id, name, dob, gender, boot_no FROM beneficiaries ORDER BY id", conn)
-            conn.close()
-        except Exception as e:
-            st.error(f"Failed to load data: {e}")
-            df = pd.DataFrame()
-
-        if df.empty:
-            st.info("No beneficiaries found.")
-        else:
-            # format date columns for display
-            if "dob" in df.columns:
-                df["dob"] = pd.to_datetime(df["dob"]).dt.date
-
-            st.dataframe(df, use_container_width=True)
+        # filtered, sorted and paged in Postgres; one page of rows per rerun
+        render_paged_view(
+            "beneficiaries",
+            ["id", "name", "dob", "gender", "boot_no"],
+            key="id",
+            filter_kinds={"name": "text", "dob": "range", "gender": GENDER_CODES, "boot_no": "exact"},
+            state_key="ben_view",
+            empty_message="No beneficiaries found.",
+        )
 
     # ---------------- Edit / Delete Beneficiary (REPLACE YOUR OLD BLOCK) ----------------
     elif menu == "Edit / Delete Beneficiary":
         st.header("Edit or Delete Beneficiary")
 
-        # Load data
-        try:
-            conn = get_connection()
-            df = pd.read_sql("SELECT id, name, dob, gender, boot_no FROM beneficiaries ORDER BY id", conn)
-            conn.close()
-        except Exception as e:
-            st.error(f"Failed to load data: {e}")
-            df = pd.DataFrame()
+        # typeahead: at most 20 matches, then the chosen row by primary key
+        sel_id = record_picker("beneficiaries", "id", "name", "edit_select", "Search by ID or name")
+        row = None
+        if sel_id is not None:
+            try:
+                row = fetch_row("beneficiaries", ["id", "name", "dob", "gender", "boot_no"], "id", sel_id)
+            except Exception as e:
+                st.error(f"Failed to load data: {e}")
 
-        if df.empty:
+        if row is None:
             st.info("No beneficiaries to edit or delete.")
         else:
-            # create selector labels
-            df["label"] = df["id"].astype(str) + " — " + df["name"]
-            selection = st.selectbox("Select beneficiary", df["label"].tolist(), key="edit_select")
-            sel_id = int(selection.split(" — ")[0])
-            row = df[df["id"] == sel_id].iloc[0]
+            sel_id = int(sel_id)
 
             # If selection changed, clear other confirmation flags so only current shows
             if "last_selected_ben" not in st.session_state or st.session_state["last_selected_ben"] != sel_id:
@@ -177,11 +202,12 @@ else:
             with st.form(f"edit_form_{sel_id}", clear_on_submit=False):
                 edit_name = st.text_input("Name", value=row["name"], key=f"edit_name_{sel_id}")
                 edit_dob = st.date_input("Birth Date", value=dob_val, key=f"edit_dob_{sel_id}")
+                # same M/F/O codes as the Add form; older Male/Female/Other rows map onto them
+                current_gender = normalize_gender(pd.Series([row["gender"]])).iloc[0]
                 edit_gender = st.selectbox(
                     "Gender",
-                    ["Male", "Female", "Other"],
-                    index=(["Male", "Female", "Other"].index(row["gender"]) if row["gender"] in ["Male", "Female",
-                                                                                                 "Other"] else 0),
+                    GENDER_CODES,
+                    index=(GENDER_CODES.index(current_gender) if current_gender in GENDER_CODES else 0),
                     key=f"edit_gender_{sel_id}"
                 )
                 edit_booth_no = st.text_input("Booth No", value=row["boot_no"])
@@ -199,15 +225,15 @@ else:
                     st.error("Name cannot be empty.")
                 else:
                     try:
-                        conn = get_connection()
-                        cur = conn.cursor()
-                        cur.execute(
-                            "UPDATE beneficiaries SET name=%s, dob=%s, gender=%s, boot_no=%s WHERE id=%s",
-                            (edit_name.strip(), edit_dob, edit_gender, edit_booth_no, sel_id)
-                        )
-                        conn.commit()
-                        cur.close()
-                        conn.close()
+                        with get_connection() as conn:
+                            cur = conn.cursor()
+                            cur.execute(
+                                "UPDATE beneficiaries SET name=%s, dob=%s, gender=%s, boot_no=%s WHERE id=%s",
+                                (edit_name.strip(), edit_dob, edit_gender, edit_booth_no, sel_id)
+                            )
+                            conn.commit()
+                            cur.close()
+                            mark_changed("beneficiaries")
                         st.success("Record updated successfully.")
                         st.rerun()
                     except Exception as e:
@@ -233,12 +259,12 @@ else:
                 if confirm_chk:
                     if st.button("Confirm Delete", key=f"confirm_del_{sel_id}"):
                         try:
-                            conn = get_connection()
-                            cur = conn.cursor()
-                            cur.execute("DELETE FROM beneficiaries WHERE id=%s", (sel_id,))
-                            conn.commit()
-                            cur.close()
-                            conn.close()
+                            with get_connection() as conn:
+                                cur = conn.cursor()
+                                cur.execute("DELETE FROM beneficiaries WHERE id=%s", (sel_id,))
+                                conn.commit()
+                                cur.close()
+                                mark_changed("beneficiaries")
                             # cleanup flag so confirmation UI disappears
                             st.session_state.pop(flag_name, None)
                             st.success("Record deleted successfully.")
@@ -249,187 +275,119 @@ else:
     # ---------------- Export / Download ----------------
     elif menu == "Export / Download":
         st.header("Export Data")
-        try:
-            conn = get_connection()
-            df = pd.read_sql("SELECT id, name, dob, gender FROM beneficiaries ORDER BY id", conn)
-            conn.close()
-        except Exception as e:
-            st.error(f"Failed to load data: {e}")
-            df = pd.DataFrame()
-
-        if df.empty:
-            st.info("No data to export.")
-        else:
-            # Format dates
-            if "dob" in df.columns:
-                df["dob"] = pd.to_datetime(df["dob"]).dt.date
-
+        # streamed from Postgres into a temp file chunk by chunk; only the finished file is held for the download
+        render_export("SELECT id, name, dob, gender FROM beneficiaries ORDER BY id", "beneficiaries",
+                      "beneficiaries", "ben_export")
 
-            st.dataframe(df, width='stretch')
-
-
-            # Excel download
-            towrite = io.BytesIO()
-            with pd.ExcelWriter(towrite, engine="openpyxl") as writer:
-                df.to_excel(writer, index=False, sheet_name="beneficiaries")
-            towrite.seek(0)
-            st.download_button(
-                label="⬇️ Download Excel",
-                data=towrite,
-                file_name="beneficiaries.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            )
 
         # Generate PDF
     elif menu == "Generate PDF":
         st.header("Generate PDF of Beneficiaries")
-        ldate = st.date_input("Immunization Date:", value=date.today(), key="add_ldate")
-        booth_name = st.text_input("Booth Name:")
-        booth_no = st.text_input("Booth No:", value=1)
-
-        ldate = ldate.strftime("%d-%m-%Y")  # उदा. 27-09-2025
-
-        try:
-            conn = get_connection()
-            query = "SELECT name, dob, gender FROM beneficiaries WHERE boot_no = %s"
-            df = pd.read_sql(query, conn, params=(booth_no,))
-            conn.close()
-            df["dob"] = pd.to_datetime(df["dob"]).dt.date
-            df.insert(0, "Sr No", range(1, len(df) + 1))
-
-        except Exception as e:
-            st.error(f"Failed to load data: {e}")
-            df = pd.DataFrame()
-
-        if df.empty:
-            st.info("No data to generate PDF.")
-        else:
-            # Make a copy of the dataframe
-            df_copy = df.copy()
-
-            # Convert 'dob' to DD-MM-YYYY string
-            if "dob" in df_copy.columns:
-                df_copy["dob"] = pd.to_datetime(df_copy["dob"]).dt.strftime("%d-%m-%Y")
-
-            # Convert to JSON-serializable dict
-            data_json = df_copy.to_dict(orient="records")
-
-            form_data = {
-
-                "booth_name": booth_name,
-                "booth_no": booth_no,
-                "ldate": ldate,
-            }
-
-            font_path = "fonts/NotoSerifDevanagari-VariableFont_wdth,wght.ttf"
-            with open(font_path, "rb") as f:
-                font_bytes = f.read()
-                font_b64 = base64.b64encode(font_bytes).decode("utf-8")
-
-            if st.button("Generate PDF") and font_b64:
-                with st.spinner("PDF तयार होत आहे..."):
-                    time.sleep(2)
-
-                st.success("✅ PDF तयार झाला! खाली प्रीव्ह्यू आणि डाउनलोड 👇")
-                components.html(
-                    f"""
-                    <html>
-                    <head>
-                      <script src="https://cdnjs.cloudflare.com/ajax/libs/pdfmake/0.1.72/pdfmake.min.js"></script>
-                      <script src="https://cdnjs.cloudflare.com/ajax/libs/pdfmake/0.1.72/vfs_fonts.js"></script>
-                    </head>
-                    <body>
-                      <div style="margin-bottom:10px;">
-                        <button onclick="previewPDF()" 
-                          style="padding:8px 12px; background:#2196F3; color:white; border:none; border-radius:6px; cursor:pointer; margin-right:8px;">
-                          👁️ Preview PDF
-                        </button>
-                        <button onclick="downloadPDF()" 
-                            style="padding:8px 12px; background:#4CAF50; color:white; border:none; border-radius:6px; cursor:pointer;">
-                            ⬇️ Download PDF
-                        </button>
-                      </div>
-
-                      <script>
-                        const data = {json.dumps(data_json, ensure_ascii=False)};
-                        const form_data = {json.dumps(form_data, ensure_ascii=False)};
-
-                        // inject custom font
-                        pdfMake.vfs["CustomFont.ttf"] = "{font_b64}";
-                        pdfMake.fonts = {{
-                          MarathiFont: {{
-                            normal: "CustomFont.ttf",
-                            bold: "CustomFont.ttf",
-                            italics: "CustomFont.ttf",
-                            bolditalics: "CustomFont.ttf"
-                          }}
-                        }};
- 
-                        // build docDefinition
-const docDefinition = {{
-  defaultStyle: {{ font: "MarathiFont" }},
-  pageMargins: [40, 161, 30, 40], // top margin मोठं header टेबलसाठी
-
-  header: function(currentPage, pageCount) {{
-    return {{
-      margin: [40, 40, 30, 0],
-      stack: [
-        {{ text: "पल्स पोलिओ लसीकरण मोहीम " + (form_data?.ldate ? form_data.ldate.split("-")[2] : ""), fontSize: 16, alignment: "center"}},
-        {{ text: "प्राथमिक आरोग्य केंद्र शेळगांव", fontSize: 16, alignment: "center"}},
-        {{ text: "उपकेंद्र: शेळगांव                                   बुथ क्रमांक: " + (form_data.booth_no || "") + "                              बुथचे नाव: " + (form_data.booth_name || ""), margin:[35,2,0,4] }},
-        {{ text: "० ते ५ वर्षे वयोगटातील अपेक्षित लाभार्थी यादी", fontSize: 14, alignment: "center" }},
-
-        // 👉 Table heading row (repeat on every page)
-        {{
-          margin: [0, 0, 0, 0],
-          table: {{
-            widths: ["5%", "45%", "15%", "5%", "15%", "15%"],
-            body: [[
-              {{ text: "अ.क्र.", bold:true, alignment: "center"}},
-              {{ text: "लाभार्थीचे नाव", bold:true, alignment: "center"}},
-              {{ text: "जन्मदिनांक", bold:true, alignment: "center"}},
-              {{ text: "लिंग", bold:true, alignment: "center"}},
-              {{ text: form_data.ldate || "", bold:true, alignment: "center"}},
-              {{ text: "शेरा", bold:true, alignment: "center"}}
-            ]]
-          }},
-        }}
-      ]
-    }};
-  }},
-
-  content: [
-    {{
-      table: {{
-        widths: ["5%", "45%", "15%", "5%", "15%", "15%"],
-        body: [
-          // ✅ फक्त data rows
-          ...data.map((d, i) => [
-            {{ text: i + 1, alignment: 'center' }},
-            {{ text: d.name || "" }},
-            {{ text: d.dob || "", alignment: 'center' }},
-            {{ text: d.gender || "", alignment: 'center' }},
-            {{ text: "", alignment: 'center' }},
-            {{ text: "", alignment: 'center' }}
-          ])
-        ]
-      }}
-    }}
-  ]
-}};
-
-
-                        function previewPDF() {{
-                          pdfMake.createPdf(docDefinition).open();
-                        }}
-
-                        function downloadPDF() {{
-                          pdfMake.createPdf(docDefinition).download("beneficiaries.pdf");
-                        }}
-                      </script>
-                    </body>
-                    </html>
-                    """,
-                    height=700,
-                    scrolling=True
+        warn_missing_indexes([BOOTH_DOB_INDEX], "The booth and due lists")
+        list_type = st.radio("List", ["Pulse polio (0-5 years)", "Routine immunization due list"],
+                             horizontal=True, key="pdf_list_type")
+        due_mode = list_type == "Routine immunization due list"
+        mode = None if due_mode else st.radio("Booths", ["One booth", "All booths (ZIP)"], horizontal=True, key="pdf_mode")
+        imm_date = st.date_input("Immunization Date:", value=date.today(), key="add_ldate")
+        ldate = imm_date.strftime("%d-%m-%Y")  # उदा. 27-09-2025
+
+        if due_mode:
+            # every dose of the schedule against every child's dob in one pass (immunization.py)
+            due_booth = st.text_input("Booth No (blank for all booths):", key="due_booth")
+            statuses = st.multiselect("Show", list(DUE_STATUSES), default=["due", "upcoming"], key="due_statuses")
+            try:
+                due_df, n_children, seconds = build_due_list(imm_date, due_booth.strip(), statuses)
+            except Exception as e:
+                st.error(f"Failed to load data: {e}")
+                due_df = None
+
+            if due_df is not None and due_df.empty:
+                st.info("No doses due for this date.")
+            elif due_df is not None:
+                counts = due_df["status"].value_counts()
+                st.write(
+                    f"{n_children:,} children checked in {seconds:.2f} s: "
+                    + ", ".join(f"{counts.get(s, 0):,} {s}" for s in statuses)
                 )
+                st.dataframe(due_df.drop(columns=["id"]).head(PREVIEW_ROWS), use_container_width=True, hide_index=True)
+                if st.button("Generate PDF", key="due_pdf_go"):
+                    st.session_state["due_pdf_ready"] = True
+
+                if st.session_state.get("due_pdf_ready"):
+                    try:
+                        with st.spinner("PDF तयार होत आहे..."):
+                            pdf, n_rows, seconds = build_due_pdf(imm_date, due_booth.strip(), statuses)
+                        st.success(f"✅ PDF तयार झाला! ({n_rows} doses, {len(pdf) / 1024:.0f} KB, {seconds:.1f} s)")
+                        st.download_button("⬇️ Download PDF", data=pdf,
+                                           file_name=f"due_list_{due_booth.strip() or 'all'}_{ldate}.pdf",
+                                           mime="application/pdf", on_click="ignore")
+                    except Exception as e:
+                        st.error(f"PDF generation failed: {e}")
+
+        elif mode == "One booth":
+            booth_name = st.text_input("Booth Name:")
+            booth_no = st.text_input("Booth No:", value=1)
+
+            # only children aged 0-5 on the immunization date, filtered in Postgres
+            query, params = booth_list_query(booth_no, imm_date)
+            try:
+                total = count_eligible(booth_no, imm_date)
+            except Exception as e:
+                st.error(f"Failed to load data: {e}")
+                total = 0
+
+            if total == 0:
+                st.info("No data to generate PDF.")
+            else:
+                st.write(f"{total} beneficiaries aged 0-{AGE_MAX_YEARS} on {ldate} in booth {booth_no}")
+                if st.button("Generate PDF"):
+                    st.session_state["ben_pdf_ready"] = True
+
+                if st.session_state.get("ben_pdf_ready"):
+                    try:
+                        # rendered on the server; cached per booth, header fields and data version
+                        with st.spinner("PDF तयार होत आहे..."):
+                            pdf, seconds = build_pdf("booth", query, ["beneficiaries"], params=params,
+                                                     booth_no=booth_no, booth_name=booth_name, ldate=ldate)
+                        st.success(f"✅ PDF तयार झाला! ({len(pdf) / 1024:.0f} KB, {seconds:.1f} s)")
+                        st.download_button("⬇️ Download PDF", data=pdf, file_name=f"beneficiaries_booth_{booth_no}.pdf",
+                                           mime="application/pdf", on_click="ignore")
+                    except Exception as e:
+                        st.error(f"PDF generation failed: {e}")
+
+            with st.expander("Query plan"):
+                try:
+                    uses_index, scans, table_rows = check_booth_plan(booth_no, imm_date)
+                    if uses_index:
+                        st.success(f"Booth list uses the (boot_no, dob) index ({', '.join(scans)}).")
+                    elif table_rows < PLAN_CHECK_MIN_ROWS:
+                        st.info(f"{', '.join(scans)} on ≈ {table_rows:,} rows; fine while the table is small.")
+                    else:
+                        st.warning(f"{', '.join(scans)} on ≈ {table_rows:,} rows: the (boot_no, dob) index is "
+                                   "missing or unused. Run ANALYZE beneficiaries, or `python migrate.py` to create it.")
+                except Exception as e:
+                    st.error(f"EXPLAIN failed: {e}")
+
+        else:
+            # one grouped query, one PDF per booth rendered in worker processes, one ZIP
+            st.caption("Booth names are left blank in the header for filling in by hand.")
+            if st.button("Generate all booths"):
+                st.session_state["ben_zip_ready"] = True
+
+            if st.session_state.get("ben_zip_ready"):
+                try:
+                    with st.spinner("सर्व बुथच्या PDF तयार होत आहेत..."):
+                        zip_bytes, timings, fetch_s, total_s = build_booth_zip(imm_date)
+                    if not timings:
+                        st.info("No data to generate PDF.")
+                    else:
+                        n_rows = sum(t["beneficiaries"] for t in timings)
+                        st.success(
+                            f"✅ {len(timings)} booths, {n_rows} beneficiaries in {total_s:.1f} s "
+                            f"(query {fetch_s:.1f} s; {len(timings) / total_s:.1f} booths/s, {n_rows / total_s:,.0f} rows/s)"
+                        )
+                        st.download_button("⬇️ Download ZIP", data=zip_bytes, file_name=f"booth_lists_{ldate}.zip",
+                                           mime="application/zip", on_click="ignore")
+                        st.dataframe(pd.DataFrame(timings), use_container_width=True, hide_index=True)
+                except Exception as e:
+                    st.error(f"PDF generation failed: {e}")
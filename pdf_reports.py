@@ -0,0 +1,204 @@
+# pdf_reports.py
+# Server-side PDFs for the M No register, the pulse polio booth list and the
+# routine immunization due list.
+# fpdf2 lays out the pages and HarfBuzz (uharfbuzz) shapes the Devanagari,
+# so conjuncts and matras come out the same as in the browser; only the used
+# glyphs of static regular/bold instances of the font are embedded.
+# Layout only: no Streamlit or database imports, so worker processes can
+# render too. Fetching and caching live in exports.py and immunization.py.
+import io
+import time
+from datetime import date
+
+from fpdf import FPDF
+
+from font_assets import BOLD, REGULAR, static_font
+
+FONT = "NotoSerifDevanagari"
+LINE = 1.5        # line height as a multiple of the font size (Devanagari needs room for matras)
+CELL_PAD = 4      # left/right cell padding in pt, as in pdfMake tables
+
+# (header text, width %, alignment, header font size, wraps)
+MNO_COLUMNS = [
+    ("M-No", 8, "C", 12, False),
+    ("कुटुंब प्रमुखाचे नाव", 45, "L", 13, True),
+    ("ए.सदस्य", 10, "C", 13, False),
+    ("रांजण", 6, "C", 13, False),
+    ("बॅलर", 5, "C", 13, False),
+    ("टाकी", 5, "C", 13, False),
+    ("डेरा", 4, "C", 13, False),
+    ("फ्रिज", 5, "C", 13, False),
+    ("इतर भांडी", 10, "C", 13, False),
+]
+BOOTH_COLUMNS = [
+    ("अ.क्र.", 5, "C", 12, False),
+    ("लाभार्थीचे नाव", 45, "L", 12, True),
+    ("जन्मदिनांक", 15, "C", 12, False),
+    ("लिंग", 5, "C", 12, False),
+    ("", 15, "C", 12, False),       # heading is the campaign date
+    ("शेरा", 15, "C", 12, False),
+]
+DUE_COLUMNS = [
+    ("अ.क्र.", 6, "C", 11, False),
+    ("लाभार्थीचे नाव", 28, "L", 11, True),
+    ("जन्मदिनांक", 12, "C", 11, False),
+    ("लिंग", 5, "C", 11, False),
+    ("बुथ", 5, "C", 11, False),
+    ("लस", 16, "L", 11, False),
+    ("देय दिनांक", 12, "C", 11, False),
+    ("स्थिती", 8, "C", 11, False),
+    ("शेरा", 8, "C", 11, False),
+]
+DUE_STATUS_LABELS = {"due": "देय", "overdue": "थकीत", "upcoming": "आगामी"}
+
+
+def _text(val):
+    if val is None:
+        return ""
+    if isinstance(val, date):
+        return val.strftime("%d-%m-%Y")
+    return str(val)
+
+
+class TablePDF(FPDF):
+    """A4 page with a fixed header (title lines + column headings) repeated on every page."""
+
+    def __init__(self, columns, margins, header_top, title_lines=(), page_numbers=False, font_size=12):
+        super().__init__(orientation="P", unit="pt", format="A4")
+        left, top, right, bottom = margins
+        self.set_margins(left, top, right)
+        self.set_auto_page_break(False)
+        self.bottom = bottom
+        # static instances of the variable font (font_assets.py); fpdf2 embeds only the glyphs used
+        self.add_font(FONT, fname=static_font(REGULAR))
+        self.add_font(FONT, "B", fname=static_font(BOLD))
+        self.set_text_shaping(True)
+        self.set_compression(True)
+        self.columns = columns
+        self.widths = [self.epw * c[1] / 100 for c in columns]
+        self.header_top = header_top
+        self.title_lines = title_lines
+        self.page_numbers = page_numbers
+        self.font_size_pt = font_size
+
+    def header(self):
+        self.set_y(self.header_top)
+        # title lines: (text, size, align, left indent, space after)
+        for text, size, align, indent, after in self.title_lines:
+            self.set_font(FONT, "", size)
+            self.set_x(self.l_margin + indent)
+            self.cell(self.epw - indent, size * LINE, text, align=align, new_x="LMARGIN", new_y="NEXT")
+            self.ln(after)
+        self._row([c[0] for c in self.columns], bold=True, sizes=[c[3] for c in self.columns], centered=True)
+
+    def footer(self):
+        if self.page_numbers:
+            self.set_y(-self.bottom + 10)
+            self.set_font(FONT, "", 9)
+            self.cell(0, 9 * LINE, str(self.page_no()), align="C")
+
+    def _row(self, values, bold=False, sizes=None, centered=False):
+        sizes = sizes or [self.font_size_pt] * len(values)
+        heights, wrapped = [], []
+        for (_, _, _, _, wraps), w, text, size in zip(self.columns, self.widths, values, sizes):
+            self.set_font(FONT, "B" if bold else "", size)
+            # one shaping pass decides; the line breaker (slow with shaping) only runs for long names
+            if wraps and text and self.get_string_width(text) > w - 2 * CELL_PAD:
+                lines = self.multi_cell(w, size * LINE, text, dry_run=True, output="LINES", padding=(0, CELL_PAD))
+                heights.append(len(lines) * size * LINE)
+                wrapped.append(True)
+            else:
+                heights.append(size * LINE)
+                wrapped.append(False)
+        h = max(heights)
+        if not bold and self.get_y() + h > self.h - self.bottom:
+            self.add_page()
+        x, y = self.l_margin, self.get_y()
+        for (_, _, align, _, _), w, text, size, wrap in zip(self.columns, self.widths, values, sizes, wrapped):
+            self.set_font(FONT, "B" if bold else "", size)
+            self.rect(x, y, w, h)
+            self.set_xy(x, y)
+            if not text:
+                pass
+            elif wrap:
+                self.multi_cell(w, size * LINE, text, align="C" if centered else align,
+                                padding=(0, CELL_PAD), new_x="RIGHT", new_y="TOP")
+            else:
+                pad = CELL_PAD if align == "L" and not centered else 0
+                self.set_x(x + pad)
+                if text.isascii():
+                    # numbers, dates, M/F/O: nothing to shape, skip HarfBuzz and bidi
+                    self.set_text_shaping(False)
+                    self.cell(w - pad, h, text, align="C" if centered else align)
+                    self.set_text_shaping(True)
+                else:
+                    self.cell(w - pad, h, text, align="C" if centered else align)
+            x += w
+        self.set_xy(self.l_margin, y + h)
+
+    def add_rows(self, rows):
+        for values in rows:
+            self._row([_text(v) for v in values])
+
+
+def render_mno_register(row_chunks, out):
+    """M No register: same columns and widths as the old pdfMake document, page numbers at the bottom."""
+    pdf = TablePDF(MNO_COLUMNS, margins=(45, 70, 20, 30), header_top=43.5, page_numbers=True)
+    pdf.add_page()
+    for _, rows in row_chunks:
+        pdf.add_rows(rows)
+    pdf.output(out)
+
+
+def render_booth_list(row_chunks, out, booth_no, booth_name, ldate):
+    """Pulse polio booth list (0-5 years) with the campaign header on every page."""
+    year = ldate.split("-")[2] if ldate and ldate.count("-") == 2 else ""
+    columns = list(BOOTH_COLUMNS)
+    columns[4] = (ldate or "",) + columns[4][1:]
+    title_lines = [
+        ("पल्स पोलिओ लसीकरण मोहीम " + year, 16, "C", 0, 0),
+        ("प्राथमिक आरोग्य केंद्र शेळगांव", 16, "C", 0, 0),
+        (f"उपकेंद्र: शेळगांव          बुथ क्रमांक: {booth_no or ''}          बुथचे नाव: {booth_name or ''}", 12, "L", 35, 4),
+        ("० ते ५ वर्षे वयोगटातील अपेक्षित लाभार्थी यादी", 14, "C", 0, 0),
+    ]
+    pdf = TablePDF(columns, margins=(40, 161, 30, 40), header_top=40, title_lines=title_lines)
+    pdf.add_page()
+    sr_no = 0
+    for _, rows in row_chunks:
+        numbered = []
+        for name, dob, gender in rows:
+            sr_no += 1
+            numbered.append((sr_no, name, dob, gender, "", ""))
+        pdf.add_rows(numbered)
+    pdf.output(out)
+
+
+def render_booth_pdf(booth_no, rows, ldate, booth_name=""):
+    """
+    One booth list as PDF bytes: (booth_no, pdf, rows, seconds).
+    Module-level and free of Streamlit/DB state so a process pool can run it.
+    """
+    start = time.perf_counter()
+    out = io.BytesIO()
+    render_booth_list([(None, rows)], out, booth_no=booth_no, booth_name=booth_name, ldate=ldate)
+    return booth_no, out.getvalue(), len(rows), time.perf_counter() - start
+
+
+def render_due_list(rows, out, ldate, booth_no=""):
+    """
+    Routine immunization due list: rows of (name, dob, gender, boot_no,
+    vaccine, due date, status) as produced by immunization.due_list.
+    """
+    title_lines = [
+        ("नियमित लसीकरण देय यादी", 16, "C", 0, 0),
+        ("प्राथमिक आरोग्य केंद्र शेळगांव", 16, "C", 0, 0),
+        (f"दिनांक: {ldate or ''}          बुथ क्रमांक: {booth_no or 'सर्व'}", 12, "L", 35, 4),
+    ]
+    pdf = TablePDF(DUE_COLUMNS, margins=(30, 130, 20, 40), header_top=40, title_lines=title_lines,
+                   page_numbers=True, font_size=11)
+    pdf.add_page()
+    pdf.add_rows(
+        (sr_no, name, dob, gender, booth, vaccine, due, DUE_STATUS_LABELS.get(status, status), "")
+        for sr_no, (name, dob, gender, booth, vaccine, due, status) in enumerate(rows, start=1)
+    )
+    pdf.output(out)
@@ -0,0 +1,260 @@
+# record_view.py
+# Server-side paged table view for the register pages.
+# Filters and sorting run in SQL and only one page of rows is fetched, using
+# keyset pagination: the next page starts after the last (sort value, key) seen
+# instead of an OFFSET, so every page costs the same however deep it is.
+import json
+
+import pandas as pd
+import streamlit as st
+
+from db import cached_read, warn_missing_indexes
+
+PAGE_SIZES = [25, 50, 100, 200]
+
+
+def quote_ident(col):
+    """Double-quoted SQL identifier (table or column name)."""
+    return '"' + col.replace('"', '""') + '"'
+
+
+def _escape_like(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def py_value(val):
+    """Plain Python value for a cursor (psycopg2 cannot adapt numpy scalars)."""
+    if val is None or (not isinstance(val, (list, tuple)) and pd.isna(val)):
+        return None
+    if isinstance(val, pd.Timestamp):
+        return val.to_pydatetime()
+    return val.item() if hasattr(val, "item") else val
+
+
+def parse_int(val):
+    """Whole number from a filter box, or None when the text is not one."""
+    try:
+        return int(str(val).strip())
+    except ValueError:
+        return None
+
+
+def build_filters(filters, kinds):
+    """
+    WHERE clauses for {column: value}. kinds[column] is
+      "text"   -> case-insensitive contains
+      "exact"  -> equality
+      "number" -> equality on a whole-number column (m_no, id)
+      "range"  -> (low, high), either end may be None
+    Empty values, and "number" values that are not whole numbers, are
+    skipped. Returns (clauses, params).
+    """
+    clauses, params = [], []
+    for col, val in filters.items():
+        kind = kinds[col]
+        c = quote_ident(col)
+        if kind == "range":
+            low, high = val
+            if low is not None:
+                clauses.append(f"{c} >= %s")
+                params.append(low)
+            if high is not None:
+                clauses.append(f"{c} <= %s")
+                params.append(high)
+        elif val is None or str(val).strip() == "":
+            continue
+        elif kind == "text":
+            clauses.append(f"{c} ILIKE %s")
+            params.append(f"%{_escape_like(str(val).strip())}%")
+        elif kind == "number":
+            # parsed here: Postgres would reject "12a" for an integer column
+            num = parse_int(val)
+            if num is None:
+                continue
+            clauses.append(f"{c} = %s")
+            params.append(num)
+        else:
+            clauses.append(f"{c} = %s")
+            params.append(str(val).strip())
+    return clauses, params
+
+
+def keyset_clause(sort_col, key, after, descending):
+    """
+    Rows that come after the cursor `after` = (sort value, key value) in the order
+    ORDER BY sort_col [DESC] NULLS LAST, key [DESC].
+    """
+    if after is None:
+        return [], []
+    sort_val, key_val = after
+    op = "<" if descending else ">"
+    s, k = quote_ident(sort_col), quote_ident(key)
+    if sort_col == key:
+        return [f"{k} {op} %s"], [key_val]
+    if sort_val is None:
+        # already inside the trailing group of NULL sort values
+        return [f"({s} IS NULL AND {k} {op} %s)"], [key_val]
+    return [f"({s} {op} %s OR ({s} = %s AND {k} {op} %s) OR {s} IS NULL)"], [sort_val, sort_val, key_val]
+
+
+def fetch_page(table, columns, key, sort_col, descending, where, params, after, limit):
+    """One page of rows (plus one extra row to tell whether a next page exists)."""
+    clauses, kparams = keyset_clause(sort_col, key, after, descending)
+    clauses = list(where) + clauses
+    direction = "DESC" if descending else "ASC"
+    if sort_col == key:
+        # plain order on the unique key, so its index can serve both directions
+        order = f"{quote_ident(key)} {direction}"
+    else:
+        order = f"{quote_ident(sort_col)} {direction} NULLS LAST, {quote_ident(key)} {direction}"
+    sql = (
+        f"SELECT {', '.join(quote_ident(c) for c in columns)} FROM {quote_ident(table)}"
+        + (f" WHERE {' AND '.join(clauses)}" if clauses else "")
+        + f" ORDER BY {order} LIMIT %s"
+    )
+    return cached_read(sql, [table], params=tuple(list(params) + kparams + [limit + 1]))
+
+
+def estimate_count(table, where, params):
+    """
+    Row count estimate from the planner: pg_class.reltuples for the whole table,
+    the EXPLAIN row estimate when filtered. No table scan either way.
+    """
+    if not where:
+        df = cached_read("SELECT reltuples::bigint AS n FROM pg_class WHERE oid = %s::regclass", [table], params=(table,))
+        n = int(df["n"].iloc[0]) if len(df) else -1
+        if n >= 0:
+            return n
+        # never analysed yet (reltuples = -1): small table, count it
+        return int(cached_read(f"SELECT count(*) AS n FROM {quote_ident(table)}", [table])["n"].iloc[0])
+    df = cached_read(
+        f"EXPLAIN (FORMAT JSON) SELECT 1 FROM {quote_ident(table)} WHERE {' AND '.join(where)}",
+        [table], params=tuple(params),
+    )
+    plan = df.iloc[0, 0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def filter_widgets(kinds, state_key):
+    """
+    One input per column of `kinds` (see render_paged_view). Returns
+    ({column: value}, {column: build_filters kind}).
+    """
+    filters = {}
+    cols = st.columns(len(kinds))
+    for box, (col, kind) in zip(cols, kinds.items()):
+        with box:
+            if kind == "range":
+                low = st.date_input(f"{col} from", value=None, key=f"{state_key}_f_{col}_lo")
+                high = st.date_input(f"{col} to", value=None, key=f"{state_key}_f_{col}_hi")
+                filters[col] = (low, high)
+            elif isinstance(kind, (list, tuple)):
+                choice = st.selectbox(col, ["All"] + list(kind), key=f"{state_key}_f_{col}")
+                filters[col] = "" if choice == "All" else choice
+            else:
+                filters[col] = st.text_input(col, key=f"{state_key}_f_{col}")
+                if kind == "number" and filters[col].strip() and parse_int(filters[col]) is None:
+                    st.caption(f"⚠️ {col} must be a whole number; filter ignored.")
+    sql_kinds = {c: ("exact" if isinstance(k, (list, tuple)) else k) for c, k in kinds.items()}
+    return filters, sql_kinds
+
+
+def render_paged_view(table, columns, key, filter_kinds, state_key, empty_message="No records found."):
+    """
+    Filter widgets, sort controls, one page of `table` and Previous / Next buttons.
+    filter_kinds maps column -> "text" | "exact" | "number" | "range" | [choices].
+    """
+    filters, kinds = filter_widgets(filter_kinds, state_key)
+    c1, c2, c3 = st.columns([2, 1, 1])
+    sort_col = c1.selectbox("Sort by", columns, index=columns.index(key), key=f"{state_key}_sort")
+    descending = c2.checkbox("Descending", key=f"{state_key}_desc")
+    page_size = c3.selectbox("Rows per page", PAGE_SIZES, index=1, key=f"{state_key}_size")
+
+    # cursor stack: the "after" cursor of every page visited; reset when the query changes
+    signature = (repr(filters), sort_col, descending, page_size)
+    if st.session_state.get(f"{state_key}_sig") != signature:
+        st.session_state[f"{state_key}_sig"] = signature
+        st.session_state[f"{state_key}_stack"] = [None]
+    stack = st.session_state[f"{state_key}_stack"]
+
+    where, params = build_filters(filters, kinds)
+    try:
+        page = fetch_page(table, columns, key, sort_col, descending, where, params, stack[-1], page_size)
+        total = estimate_count(table, where, params)
+    except Exception as e:
+        st.error(f"Failed to load data: {e}")
+        return
+
+    has_next = len(page) > page_size
+    page = page.iloc[:page_size]
+    if page.empty:
+        st.info(empty_message)
+        return
+
+    first = (len(stack) - 1) * page_size + 1
+    st.caption(f"Rows {first}–{first + len(page) - 1} of ≈ {total:,}")
+    st.dataframe(page, use_container_width=True, hide_index=True)
+
+    last = page.iloc[-1]
+    next_cursor = (py_value(last[sort_col]), py_value(last[key]))
+    b1, b2, _ = st.columns([1, 1, 4])
+    b1.button("◀ Previous", key=f"{state_key}_prev", disabled=len(stack) == 1,
+              on_click=stack.pop)
+    b2.button("Next ▶", key=f"{state_key}_next", disabled=not has_next,
+              on_click=stack.append, args=(next_cursor,))
+
+
+# ---------- Typeahead record picker ----------
+PICKER_LIMIT = 20
+
+
+def search_records(table, key, label_col, text, limit=PICKER_LIMIT):
+    """Up to `limit` (key, label) rows whose key starts with `text` or whose label contains it."""
+    k, lbl = quote_ident(key), quote_ident(label_col)
+    text = text.strip()
+    if not text:
+        sql = f"SELECT {k}, {lbl} FROM {quote_ident(table)} ORDER BY {k} LIMIT %s"
+        params = (limit,)
+    else:
+        pattern = _escape_like(text)
+        sql = (
+            f"SELECT {k}, {lbl} FROM {quote_ident(table)} "
+            f"WHERE {k}::text LIKE %s OR {lbl} ILIKE %s ORDER BY {k} LIMIT %s"
+        )
+        params = (pattern + "%", "%" + pattern + "%", limit)
+    return cached_read(sql, [table], params=params)
+
+
+def fetch_row(table, columns, key, value):
+    """The single row with key = value, or None."""
+    df = cached_read(
+        f"SELECT {', '.join(quote_ident(c) for c in columns)} FROM {quote_ident(table)} WHERE {quote_ident(key)} = %s",
+        [table], params=(py_value(value),),
+    )
+    return df.iloc[0] if len(df) else None
+
+
+def record_picker(table, key, label_col, state_key, search_label):
+    """
+    Search box plus a selectbox of at most PICKER_LIMIT matches.
+    Returns the selected key value, or None when nothing matches.
+    """
+    # key prefix and label trigram indexes come from migrate.py (db.INDEXES)
+    warn_missing_indexes([f"{table}_{key}_prefix_idx", f"{table}_{label_col}_trgm_idx"], "Record search")
+    text = st.text_input(search_label, key=f"{state_key}_q")
+    try:
+        hits = search_records(table, key, label_col, text)
+    except Exception as e:
+        st.error(f"Search failed: {e}")
+        return None
+    if hits.empty:
+        return None
+    keys = [py_value(v) for v in hits[key]]
+    labels = dict(zip(keys, hits[label_col].astype(str)))
+    if len(hits) == PICKER_LIMIT:
+        st.caption(f"Showing the first {PICKER_LIMIT} matches; type more to narrow down.")
+    return st.selectbox(
+        "Select record", keys, format_func=lambda v: f"{v} — {labels[v]}", key=f"{state_key}_select"
+    )
@@ -0,0 +1,714 @@
+# screening_search.py
+# Name-matching engine used by pages/Screening_Check.py.
+# Kept free of Streamlit so it can be imported from any page or script.
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from types import MappingProxyType
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from rapidfuzz import fuzz, process   # pip install rapidfuzz
+
+NAME_COLS = ["First Name", "Middle Name", "Last Name"]
+SCREENING_COLS = [
+    "HTN_Screening_Status",
+    "DM_Screening_Status",
+    "OC_Screening_Status",
+    "BC_Screening_Status",
+    "CC_Screening_Status"
+]
+PENDING_STATUS = "pending screening"
+WORKLIST_COLS = ["Village", "First Name", "Middle Name", "Last Name", "Age", "Sex", "Mobile #", "Address"]
+# typed loading: names as Arrow strings, Age numeric, repetitive columns categorical
+ARROW_STRING = pd.ArrowDtype(pa.string())
+NUMERIC_COLS = ["Age"]
+# a column with at most this share of distinct values becomes categorical
+CATEGORY_MAX_UNIQUE = 0.5
+SUBSTRING_BOOST = 90.0
+# trigram pruning: share of the query's 3-letter chunks a name must contain
+# to be scored (lower = better recall, higher = faster on big files)
+MIN_TRIGRAM_OVERLAP = 0.2
+# fewer candidates than this -> score every row instead
+MIN_CANDIDATES = 50
+# normalized copy of the workbook, written next to it
+SIDECAR_SUFFIX = ".cache.parquet"
+SIDECAR_FORMAT = "2"  # bump when normalize_names() output changes
+
+
+def normalize_names(df):
+    """
+    Make sure the name columns exist and add the normalized helper columns
+    (`_full` and the casefolded `_*_lc` columns) used by the matcher.
+    """
+    for c in NAME_COLS:
+        if c not in df.columns:
+            df[c] = ""
+        df[c] = df[c].astype(str).str.strip()
+    # build normalized full name string (single spaces)
+    df["_full"] = (
+        df["First Name"].str.strip() + " " +
+        df["Middle Name"].str.strip() + " " +
+        df["Last Name"].str.strip()
+    ).str.split().str.join(" ")
+    # lowercase helpers for exact-equality checks
+    df["_full_lc"] = df["_full"].str.casefold()
+    df["_first_lc"] = df["First Name"].str.casefold()
+    df["_middle_lc"] = df["Middle Name"].str.casefold()
+    df["_last_lc"] = df["Last Name"].str.casefold()
+    return df
+
+
+def build_name_variants(full, first, middle, last):
+    """
+    Candidate name strings for one person: full, first+middle, first(+tokens)+last,
+    first, middle+last, middle, last. Empty strings are dropped.
+    """
+    full = str(full).strip()
+    first = str(first).strip()
+    middle = str(middle).strip()
+    last = str(last).strip()
+
+    # If First Name contains multiple tokens, treat them as possible first+middle
+    first_tokens = [t for t in first.split() if t]
+    first_variants = []
+    if first_tokens:
+        # e.g. if First = "Ram Kumar", variants: "Ram", "Ram Kumar"
+        for i in range(1, len(first_tokens)+1):
+            first_variants.append(" ".join(first_tokens[:i]))
+    else:
+        first_variants.append(first)
+
+    candidates = set()
+    if full:
+        candidates.add(full)
+    if first and middle:
+        candidates.add((first + " " + middle).strip())
+    if last:
+        for fv in first_variants:
+            if fv:
+                candidates.add((fv + " " + last).strip())
+    candidates.add(first)
+    if middle and last:
+        candidates.add((middle + " " + last).strip())
+    if middle:
+        candidates.add(middle)
+    if last:
+        candidates.add(last)
+    candidates.discard("")
+    # sorted so the flat layout is the same on every load
+    return sorted(candidates)
+
+
+# ---------- Workbook loading (with Parquet sidecar) ----------
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _sidecar_meta(path, sha256=None):
+    st_ = os.stat(path)
+    return {
+        b"format": SIDECAR_FORMAT.encode(),
+        b"mtime_ns": str(st_.st_mtime_ns).encode(),
+        b"size": str(st_.st_size).encode(),
+        b"sha256": (sha256 or file_sha256(path)).encode(),
+    }
+
+
+def _read_sidecar(path, sidecar):
+    """Return the cached frame if the sidecar still matches the workbook, else None."""
+    if not os.path.exists(sidecar):
+        return None
+    try:
+        meta = pq.read_schema(sidecar).metadata or {}
+    except Exception:
+        return None
+    if meta.get(b"format") != SIDECAR_FORMAT.encode():
+        return None
+    st_ = os.stat(path)
+    same_stat = (meta.get(b"mtime_ns") == str(st_.st_mtime_ns).encode()
+                 and meta.get(b"size") == str(st_.st_size).encode())
+    # mtime can change without the content changing (copy, touch, git checkout)
+    if not same_stat and meta.get(b"sha256") != file_sha256(path).encode():
+        return None
+    table = pq.read_table(sidecar, memory_map=True)
+    df = table.to_pandas()
+    if not same_stat:
+        _write_sidecar(path, sidecar, df)
+    return df
+
+
+def _write_sidecar(path, sidecar, df):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), **_sidecar_meta(path)})
+    tmp = None
+    try:
+        # unique temp name: several threads (sessions, the SQLite build) may write at once
+        fd, tmp = tempfile.mkstemp(prefix=os.path.basename(sidecar) + ".", suffix=".tmp",
+                                   dir=os.path.dirname(os.path.abspath(sidecar)))
+        os.close(fd)
+        pq.write_table(table, tmp)
+        os.replace(tmp, sidecar)
+    except OSError:
+        # read-only folder etc. -> just run without the sidecar
+        if tmp and os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def load_screening_frame(path):
+    """
+    Read the screening workbook with normalized name columns.
+    Uses the Parquet sidecar when it matches the workbook (mtime/size, then
+    content hash); otherwise parses the Excel file and rebuilds the sidecar.
+    """
+    sidecar = path + SIDECAR_SUFFIX
+    df = _read_sidecar(path, sidecar)
+    if df is not None:
+        return df
+    # read everything as string to avoid NaNs; if file missing, raise
+    df = pd.read_excel(path, dtype=str).fillna("")
+    df = normalize_names(df)
+    for c in SCREENING_COLS:
+        if c not in df.columns:
+            df[c] = ""
+    df = compact_types(df)
+    _write_sidecar(path, sidecar, df)
+    return df
+
+
+def _compact_number(col):
+    """Int16 when every value is a whole number in range, else float32 (e.g. an age of 34.5)."""
+    nums = pd.to_numeric(col.astype(str).str.strip(), errors="coerce")
+    valid = nums.dropna()
+    if ((valid % 1 == 0) & valid.between(-32768, 32767)).all():
+        return nums.astype("Int16")
+    return nums.astype("float32")
+
+
+def compact_types(df):
+    """
+    Replace the all-object frame from read_excel(dtype=str) with compact
+    dtypes: Arrow strings for names (and other mostly-unique text), numeric
+    Age, categoricals for Village, Sex, statuses and other repetitive columns.
+    """
+    out = {}
+    for c in df.columns:
+        col = df[c]
+        if c in NUMERIC_COLS:
+            out[c] = _compact_number(col)
+        elif c in NAME_COLS or str(c).startswith("_"):
+            out[c] = col.astype(ARROW_STRING)
+        elif col.nunique() <= CATEGORY_MAX_UNIQUE * max(len(col), 1):
+            out[c] = col.astype("category")
+        else:
+            out[c] = col.astype(ARROW_STRING)
+    return pd.DataFrame(out, index=df.index)
+
+
+def memory_report(df):
+    """Bytes per column as loaded (compact dtypes) vs. all object strings."""
+    before = {
+        c: df[c].astype(object).where(df[c].notna(), "").astype(str).memory_usage(deep=True, index=False)
+        for c in df.columns
+    }
+    after = df.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({
+        "Type": [str(df[c].dtype) for c in df.columns],
+        "Object strings (bytes)": [before[c] for c in df.columns],
+        "Loaded (bytes)": [after[c] for c in df.columns],
+    }, index=pd.Index(df.columns, name="Column"))
+    report.loc["Total"] = ["", report["Object strings (bytes)"].sum(), report["Loaded (bytes)"].sum()]
+    return report
+
+
+# ---------- Pending screening aggregates ----------
+def screening_label(col):
+    """HTN_Screening_Status -> HTN"""
+    return col.split("_", 1)[0]
+
+
+def pending_flags(df):
+    """
+    Boolean frame (one column per screening type): True where the status is
+    "Pending Screening". Compares the few distinct categories, not every cell.
+    """
+    flags = {}
+    for c in SCREENING_COLS:
+        if c not in df.columns:
+            flags[screening_label(c)] = np.zeros(len(df), dtype=bool)
+            continue
+        cat = df[c].astype("category")
+        pending = [i for i, v in enumerate(cat.cat.categories) if str(v).strip().casefold() == PENDING_STATUS]
+        flags[screening_label(c)] = cat.cat.codes.isin(pending).to_numpy()
+    return pd.DataFrame(flags, index=df.index)
+
+
+def pending_summary(df):
+    """Pending Screening counts per village and screening type, with a total row."""
+    flags = pending_flags(df)
+    village = df["Village"] if "Village" in df.columns else pd.Series("", index=df.index)
+    village = pd.Categorical(village.astype(str).str.strip())
+    counts = flags.groupby(village, observed=True).sum()
+    counts["Any pending"] = flags.any(axis=1).groupby(village, observed=True).sum()
+    counts["People"] = pd.Series(1, index=df.index).groupby(village, observed=True).sum()
+    counts.index.name = "Village"
+    counts.loc["Total"] = counts.sum()
+    return counts.astype(int)
+
+
+def pending_worklist(df):
+    """People with at least one Pending Screening, sorted by village and name."""
+    flags = pending_flags(df)
+    any_pending = flags.any(axis=1).to_numpy()
+    cols = [c for c in WORKLIST_COLS if c in df.columns]
+    work = df.loc[any_pending, cols].copy()
+    for label in flags.columns:
+        work[label] = np.where(flags.loc[any_pending, label], "Pending", "")
+    if "Village" in work.columns:
+        work["Village"] = work["Village"].astype(str).str.strip()
+    sort_cols = [c for c in ["Village", "Last Name", "First Name"] if c in work.columns]
+    return work.sort_values(sort_cols, kind="stable").reset_index(drop=True)
+
+
+# ---------- Reference (row-at-a-time) matcher ----------
+def compute_best_score_for_row(row, query, query_lc):
+    """
+    Build several name variants for a row and compute similarity scores.
+    Return final score (0-100).
+    Kept as the reference implementation; the page uses score_query().
+    """
+    candidates = build_name_variants(row["_full"], row["First Name"], row["Middle Name"], row["Last Name"])
+
+    # compute similarity scores
+    scores = []
+    exact_match_found = False
+    for cand in candidates:
+        cand_lc = cand.casefold()
+        # exact equality (case-insensitive) -> huge boost
+        if cand_lc == query_lc and query_lc != "":
+            exact_match_found = True
+            scores.append(100.0)
+            continue
+        # else compute WRatio (good general-purpose)
+        try:
+            s = fuzz.WRatio(query, cand)  # 0-100
+        except Exception:
+            s = 0.0
+        scores.append(s)
+
+    base = max(scores) if scores else 0.0
+
+    # slight boost if query is substring of full name or vice-versa
+    try:
+        if query_lc and query_lc in str(row["_full_lc"]):
+            base = max(base, SUBSTRING_BOOST)
+        if row["_full_lc"] and row["_full_lc"] in query_lc:
+            base = max(base, SUBSTRING_BOOST)
+    except Exception:
+        pass
+
+    # final boost for exact match
+    if exact_match_found:
+        return 100.0
+    return min(100.0, base)
+
+
+# ---------- Batched matcher ----------
+@dataclass
+class NameVariants:
+    """Flat array of every row's name variants plus the row-id map."""
+    text: list            # variant strings, grouped by row
+    text_lc: np.ndarray   # casefolded variants (object array)
+    row: np.ndarray       # row position (into the DataFrame) of each variant
+    offsets: np.ndarray   # start of each row's block in `text`
+    counts: np.ndarray    # number of variants per row
+    full_lc: np.ndarray   # `_full_lc` per row (object array)
+
+
+def build_variant_index(df):
+    """Build the variants for every row once, at load time."""
+    text = []
+    counts = np.zeros(len(df), dtype=np.int64)
+    cols = zip(df["_full"], df["First Name"], df["Middle Name"], df["Last Name"])
+    for i, (full, first, middle, last) in enumerate(cols):
+        cands = build_name_variants(full, first, middle, last)
+        counts[i] = len(cands)
+        text.extend(cands)
+    offsets = np.zeros(len(df), dtype=np.int64)
+    if len(df):
+        offsets[1:] = np.cumsum(counts)[:-1]
+    return NameVariants(
+        text=text,
+        text_lc=np.array([t.casefold() for t in text], dtype=object),
+        row=np.repeat(np.arange(len(df), dtype=np.int64), counts),
+        offsets=offsets,
+        counts=counts,
+        full_lc=df["_full_lc"].to_numpy(dtype=object),
+    )
+
+
+def _apply_substring_boost(best, full_lc, query_lc):
+    """Slight boost (in place) if query is substring of full name or vice-versa."""
+    boost = np.fromiter(
+        (bool(query_lc and query_lc in f) or bool(f and f in query_lc) for f in full_lc),
+        dtype=bool, count=len(full_lc),
+    )
+    np.maximum(best, np.where(boost, SUBSTRING_BOOST, 0.0), out=best)
+    np.minimum(best, 100.0, out=best)
+
+
+def score_query(variants, query, query_lc, rows=None, workers=-1):
+    """
+    Score rows against `query` in one batched rapidfuzz call.
+    Same rules as compute_best_score_for_row(); returns one float per row.
+    With `rows`, only those row positions are scored and the rest stay 0.
+    """
+    n_rows = len(variants.counts)
+    row_scores = np.zeros(n_rows, dtype=np.float64)
+    if rows is None:
+        text, text_lc = variants.text, variants.text_lc
+        counts, offsets, full_lc = variants.counts, variants.offsets, variants.full_lc
+    else:
+        rows = np.asarray(rows, dtype=np.int64)
+        counts = variants.counts[rows]
+        offsets = np.zeros(len(rows), dtype=np.int64)
+        if len(rows):
+            offsets[1:] = np.cumsum(counts)[:-1]
+        # positions of the selected rows' variants in the flat arrays
+        vidx = np.repeat(variants.offsets[rows] - offsets, counts) + np.arange(counts.sum())
+        text = [variants.text[i] for i in vidx]
+        text_lc = variants.text_lc[vidx]
+        full_lc = variants.full_lc[rows]
+    if not text:
+        return row_scores
+
+    scores = process.cdist(
+        [query], text, scorer=fuzz.WRatio, dtype=np.float64, workers=workers
+    )[0]
+    if query_lc:
+        scores[text_lc == query_lc] = 100.0
+
+    # per-row max; rows without variants keep 0
+    best = np.zeros(len(counts), dtype=np.float64)
+    has_variants = counts > 0
+    best[has_variants] = np.maximum.reduceat(scores, offsets[has_variants])
+
+    _apply_substring_boost(best, full_lc, query_lc)
+    if rows is None:
+        return best
+    row_scores[rows] = best
+    return row_scores
+
+
+def score_queries(variants, queries, workers=-1):
+    """
+    Row scores for several queries at once: one multi-threaded cdist call
+    over all name variants, same rules as score_query().
+    Returns an array of shape (len(queries), n_rows).
+    """
+    queries = [str(q).strip() for q in queries]
+    n_rows = len(variants.counts)
+    out = np.zeros((len(queries), n_rows), dtype=np.float64)
+    if not queries or not variants.text:
+        return out
+
+    scores = process.cdist(
+        queries, variants.text, scorer=fuzz.WRatio, dtype=np.float64, workers=workers
+    )
+    # exact (casefolded) variant matches -> 100
+    codes, uniques = pd.factorize(variants.text_lc)
+    queries_lc = [q.casefold() for q in queries]
+    exact = pd.Index(uniques).get_indexer(queries_lc)
+    for i, code in enumerate(exact):
+        if code >= 0 and queries_lc[i]:
+            scores[i, codes == code] = 100.0
+
+    has_variants = variants.counts > 0
+    if has_variants.any():
+        out[:, has_variants] = np.maximum.reduceat(scores, variants.offsets[has_variants], axis=1)
+    for i, query_lc in enumerate(queries_lc):
+        _apply_substring_boost(out[i], variants.full_lc, query_lc)
+    return out
+
+
+# ---------- Trigram candidate pruning ----------
+@dataclass
+class TrigramIndex:
+    """Inverted index: character trigram -> distinct variant -> rows."""
+    keys: np.ndarray         # sorted unique trigram keys
+    key_starts: np.ndarray   # posting list of keys[i] is key_uids[key_starts[i]:key_starts[i+1]]
+    key_uids: np.ndarray     # distinct-variant ids, grouped by trigram
+    uid_starts: np.ndarray   # rows of variant u are uid_rows[uid_starts[u]:uid_starts[u+1]]
+    uid_rows: np.ndarray     # row positions, grouped by distinct variant
+
+
+def _trigram_keys(strings):
+    """
+    Trigram keys (three code points packed into one uint64) for a list of
+    strings, plus the index of the string each trigram came from.
+    """
+    joined = "\x00".join(strings)
+    codes = np.frombuffer(joined.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    owner = np.cumsum(codes == 0)
+    if len(codes) < 3:
+        return np.array([], dtype=np.uint64), np.array([], dtype=np.int64)
+    keys = (codes[:-2] << np.uint64(42)) | (codes[1:-1] << np.uint64(21)) | codes[2:]
+    # drop trigrams that span two strings
+    valid = (codes[:-2] != 0) & (codes[1:-1] != 0) & (codes[2:] != 0)
+    return keys[valid], owner[:-2][valid]
+
+
+def build_trigram_index(variants, chunk=200_000):
+    """Build the trigram index over the (casefolded) name variants, at load time."""
+    uid_of_variant, uniques = pd.factorize(variants.text_lc)
+    uniques = list(uniques)
+
+    pair_keys, pair_uids = [], []
+    for start in range(0, len(uniques), chunk):
+        keys, owner = _trigram_keys(uniques[start:start + chunk])
+        # one entry per (trigram, variant) pair
+        pairs = np.unique(np.stack([keys, (owner + start).astype(np.uint64)]), axis=1)
+        pair_keys.append(pairs[0])
+        pair_uids.append(pairs[1].astype(np.int64))
+    keys = np.concatenate(pair_keys) if pair_keys else np.array([], dtype=np.uint64)
+    uids = np.concatenate(pair_uids) if pair_uids else np.array([], dtype=np.int64)
+    order = np.argsort(keys, kind="stable")
+    keys, uids = keys[order], uids[order]
+    unique_keys, key_starts = np.unique(keys, return_index=True)
+
+    order = np.argsort(uid_of_variant, kind="stable")
+    uid_starts = np.zeros(len(uniques) + 1, dtype=np.int64)
+    uid_starts[1:] = np.cumsum(np.bincount(uid_of_variant, minlength=len(uniques)))
+    return TrigramIndex(
+        keys=unique_keys,
+        key_starts=np.append(key_starts, len(keys)).astype(np.int64),
+        key_uids=uids,
+        uid_starts=uid_starts,
+        uid_rows=variants.row[order],
+    )
+
+
+def candidate_rows(trigrams, query_lc, min_overlap):
+    """
+    Rows having a name variant that shares at least `min_overlap` (0-1) of
+    the query's trigrams, or None when the query is too short to prune.
+    """
+    qkeys, _ = _trigram_keys([query_lc])
+    qkeys = np.unique(qkeys)
+    if len(qkeys) == 0 or len(trigrams.keys) == 0:
+        return None
+    pos = np.searchsorted(trigrams.keys, qkeys)
+    pos = pos[(pos < len(trigrams.keys)) & (trigrams.keys[np.minimum(pos, len(trigrams.keys) - 1)] == qkeys)]
+    if len(pos) == 0:
+        return np.array([], dtype=np.int64)
+    postings = np.concatenate([
+        trigrams.key_uids[trigrams.key_starts[p]:trigrams.key_starts[p + 1]] for p in pos
+    ])
+    shared = np.bincount(postings, minlength=len(trigrams.uid_starts) - 1)
+    need = max(1, int(np.ceil(min_overlap * len(qkeys))))
+    uids = np.flatnonzero(shared >= need)
+    starts, ends = trigrams.uid_starts[uids], trigrams.uid_starts[uids + 1]
+    counts = ends - starts
+    idx = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+    return np.unique(trigrams.uid_rows[idx])
+
+
+def search_scores(variants, trigrams, query, query_lc, min_overlap, min_candidates):
+    """
+    score_query() restricted to the trigram candidates; falls back to a full
+    scan when the query is too short or the candidate set is too small.
+    """
+    rows = candidate_rows(trigrams, query_lc, min_overlap) if trigrams is not None else None
+    if rows is not None and len(rows) < min_candidates:
+        rows = None
+    return score_query(variants, query, query_lc, rows=rows)
+
+
+def top_n_indices(scores, full, n):
+    """
+    Row positions of the best `n` scores, ties broken by full name and then
+    by row order (same order as sorting the whole frame), without a full sort.
+    """
+    if n <= 0 or len(scores) == 0:
+        return np.array([], dtype=np.int64)
+    if len(scores) > n:
+        kth = np.partition(scores, len(scores) - n)[len(scores) - n]
+        cand = np.flatnonzero(scores >= kth)
+    else:
+        cand = np.arange(len(scores))
+    ranked = sorted(cand, key=lambda i: (-scores[i], full[i]))
+    return np.array(ranked[:n], dtype=np.int64)
+
+
+# ---------- Shared read-only dataset ----------
+def make_display_name(first, middle, last, village):
+    """"First Middle Last — Village" as shown in the person picker."""
+    name = " ".join([s for s in [first, middle, last] if s])
+    village = str(village).strip()
+    if village:
+        return f"{name} — {village}"
+    return name
+
+
+def _read_only(arr):
+    arr.flags.writeable = False
+    return arr
+
+
+@dataclass(frozen=True)
+class ScreeningData:
+    """
+    Everything a search needs, built once per workbook version and shared
+    by all sessions. Nothing here may be mutated; per-query results belong
+    in separate (small) arrays.
+    """
+    df: pd.DataFrame
+    variants: NameVariants
+    trigrams: TrigramIndex
+    full: np.ndarray      # `_full` per row (tie-breaker for top-N)
+    display: np.ndarray   # display name per row
+    mobile_index: MappingProxyType  # normalized mobile -> rows
+    name_index: MappingProxyType    # `_full_lc` -> rows
+    version: object = None
+
+
+def load_screening_data(path, version=None):
+    """Load the workbook and build the name variants, trigram index and display names."""
+    return build_screening_data(load_screening_frame(path), version=version)
+
+
+def build_screening_data(df, version=None):
+    """ScreeningData for an already loaded frame (normalized by normalize_names())."""
+    village = df["Village"] if "Village" in df.columns else [""] * len(df)
+    display = np.array(
+        [make_display_name(f, m, l, v) for f, m, l, v in
+         zip(df["First Name"], df["Middle Name"], df["Last Name"], village)],
+        dtype=object,
+    )
+    variants = build_variant_index(df)
+    trigrams = build_trigram_index(variants)
+    for arr in [variants.text_lc, variants.row, variants.offsets, variants.counts, variants.full_lc,
+                trigrams.keys, trigrams.key_starts, trigrams.key_uids, trigrams.uid_starts, trigrams.uid_rows]:
+        _read_only(arr)
+    return ScreeningData(
+        df=df,
+        variants=variants,
+        trigrams=trigrams,
+        full=_read_only(df["_full"].to_numpy(dtype=object, copy=True)),
+        display=_read_only(display),
+        mobile_index=_hash_index(mobile_keys(df)),
+        name_index=_hash_index(df["_full_lc"].astype(object)),
+        version=version,
+    )
+
+
+# ---------- Exact lookups (mobile number / full name) ----------
+MOBILE_DIGITS = 10
+_PHONE_LIKE = re.compile(r"\+?[\d\s\-()]+")
+
+
+def normalize_mobile(text):
+    """Digits only, without the +91 / 0 prefix; "" unless it is a 10-digit number."""
+    digits = re.sub(r"\D", "", str(text))
+    if len(digits) == MOBILE_DIGITS + 2 and digits.startswith("91"):
+        digits = digits[2:]
+    elif len(digits) == MOBILE_DIGITS + 1 and digits.startswith("0"):
+        digits = digits[1:]
+    return digits if len(digits) == MOBILE_DIGITS else ""
+
+
+def looks_like_mobile(query):
+    return bool(_PHONE_LIKE.fullmatch(query)) and sum(ch.isdigit() for ch in query) >= 6
+
+
+def mobile_keys(df):
+    if "Mobile #" not in df.columns:
+        return pd.Series("", index=df.index, dtype=object)
+    return df["Mobile #"].astype(object).map(lambda v: "" if pd.isna(v) else normalize_mobile(v))
+
+
+def _hash_index(keys):
+    """key -> read-only array of row positions (empty keys are skipped)."""
+    keys = np.asarray(keys, dtype=object)
+    rows = np.flatnonzero(keys != "")
+    groups = pd.Series(rows).groupby(keys[rows]).indices
+    return MappingProxyType({k: _read_only(rows[v]) for k, v in groups.items()})
+
+
+def exact_matches(data, query, query_lc, n):
+    """
+    (top row positions, scores) for a phone-number query or a query equal to
+    someone's full name, or None when the fuzzy search has to run.
+    """
+    if looks_like_mobile(query):
+        rows = data.mobile_index.get(normalize_mobile(query), np.array([], dtype=np.int64))
+    else:
+        rows = data.name_index.get(query_lc)
+        if rows is None:
+            return None
+    # same order as the fuzzy results: by full name, then sheet order
+    rows = rows[np.argsort(data.full[rows], kind="stable")][:n]
+    return rows, np.full(len(rows), 100.0)
+
+
+# ---------- Result cache ----------
+def normalize_query(text):
+    """Strip and collapse inner whitespace, so "ram  kumar " and "ram kumar" share results."""
+    return " ".join(str(text).split())
+
+
+class ResultCache:
+    """
+    Size-bounded LRU of search results, shared by every session of the
+    process. Entries belong to one dataset version; a new version empties it.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        with self._lock:
+            if version != self.version:
+                self._entries.clear()
+                self.version = version
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, version, value):
+        with self._lock:
+            if version != self.version:
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max entries": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit rate": self.hits / total if total else 0.0,
+            }
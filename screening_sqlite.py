@@ -0,0 +1,261 @@
+# screening_sqlite.py
+# SQLite + FTS5 backend for the Screening_Check name search.
+# The workbook is copied into a local SQLite file with an FTS5 trigram index
+# over the same name variants used by compute_best_score_for_row(); a query
+# pulls a small candidate set from FTS5 and rapidfuzz re-ranks it.
+#
+#   python screening_sqlite.py build   [Shelgaon.xlsx] [--db Shelgaon.sqlite]
+#   python screening_sqlite.py compare [Shelgaon.xlsx] [--db Shelgaon.sqlite]
+import argparse
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+from screening_search import (
+    MIN_CANDIDATES, MIN_TRIGRAM_OVERLAP, SIDECAR_FORMAT, file_sha256,
+    load_screening_frame, load_screening_data, build_variant_index, make_display_name, score_query, search_scores, top_n_indices,
+    exact_matches, looks_like_mobile, mobile_keys, normalize_mobile,
+)
+
+DB_FORMAT = "2-" + SIDECAR_FORMAT
+# variant hits taken from FTS5 (best bm25 first) before re-ranking
+FTS_CANDIDATES = 1000
+
+
+def default_db_path(xlsx_path):
+    return os.path.splitext(xlsx_path)[0] + ".sqlite"
+
+
+def _text(val):
+    return "" if pd.isna(val) else str(val)
+
+
+# ---------- Build ----------
+def build_sqlite(xlsx_path, db_path=None):
+    """(Re)build the SQLite database for a workbook; returns the database path."""
+    db_path = db_path or default_db_path(xlsx_path)
+    df = load_screening_frame(xlsx_path)
+    variants = build_variant_index(df)
+
+    people = pd.DataFrame({c: df[c].map(_text).astype(object) for c in df.columns})
+    village = people["Village"] if "Village" in people.columns else [""] * len(people)
+    people["_display"] = [
+        make_display_name(f, m, l, v) for f, m, l, v in
+        zip(people["First Name"], people["Middle Name"], people["Last Name"], village)
+    ]
+    people["_mobile"] = mobile_keys(df).to_numpy()
+    people.insert(0, "row_id", np.arange(len(people), dtype=np.int64))
+
+    # unique temp name: builds in other threads of this process must not share it
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(db_path) + ".", suffix=".tmp",
+                               dir=os.path.dirname(os.path.abspath(db_path)))
+    os.close(fd)
+    conn = sqlite3.connect(tmp)
+    try:
+        people.to_sql("people", conn, index=False)
+        conn.execute("CREATE UNIQUE INDEX people_row_id ON people(row_id)")
+        # exact lookups: phone number and full name
+        conn.execute("CREATE INDEX people_mobile ON people(_mobile) WHERE _mobile != ''")
+        conn.execute("CREATE INDEX people_full_lc ON people(_full_lc)")
+        conn.execute("CREATE VIRTUAL TABLE name_variants USING fts5(variant, row_id UNINDEXED, tokenize='trigram')")
+        conn.executemany(
+            "INSERT INTO name_variants (variant, row_id) VALUES (?, ?)",
+            zip(variants.text_lc.tolist(), variants.row.tolist()),
+        )
+        conn.execute("INSERT INTO name_variants (name_variants) VALUES ('optimize')")
+        st_ = os.stat(xlsx_path)
+        conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ("format", DB_FORMAT),
+            ("mtime_ns", str(st_.st_mtime_ns)),
+            ("sha256", file_sha256(xlsx_path)),
+        ])
+        conn.commit()
+        conn.close()
+        os.replace(tmp, db_path)
+    except BaseException:
+        conn.close()
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return db_path
+
+
+def is_current(xlsx_path, db_path):
+    """True when the database exists and was built from this version of the workbook."""
+    if not os.path.exists(db_path):
+        return False
+    try:
+        with closing(connect(db_path)) as conn:
+            meta = dict(conn.execute("SELECT key, value FROM meta"))
+    except sqlite3.Error:
+        return False
+    if meta.get("format") != DB_FORMAT:
+        return False
+    if meta.get("mtime_ns") == str(os.stat(xlsx_path).st_mtime_ns):
+        return True
+    return meta.get("sha256") == file_sha256(xlsx_path)
+
+
+# ---------- Query ----------
+def connect(db_path):
+    # read-only; one short-lived connection per search keeps threads independent
+    return sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+
+
+def _fts_query(query_lc):
+    """OR of the query's trigrams, each quoted for FTS5."""
+    grams = sorted({query_lc[i:i + 3] for i in range(len(query_lc) - 2)})
+    grams = [g for g in grams if g.strip()]
+    return " OR ".join('"' + g.replace('"', '""') + '"' for g in grams)
+
+
+def candidate_row_ids(conn, query_lc, limit=FTS_CANDIDATES):
+    match = _fts_query(query_lc)
+    if match:
+        sql = "SELECT row_id FROM name_variants WHERE name_variants MATCH ? ORDER BY rank LIMIT ?"
+        params = (match, limit)
+    else:
+        # fewer than 3 characters: nothing for the trigram index to use
+        sql = "SELECT row_id FROM name_variants WHERE variant LIKE ? LIMIT ?"
+        params = (query_lc.replace("%", "").replace("_", "") + "%", limit)
+    return sorted({r[0] for r in conn.execute(sql, params)})
+
+
+def search_sqlite(db_path, query, query_lc, top_n):
+    """
+    Top-N people for `query`: FTS5 candidates re-ranked with the same rules
+    as compute_best_score_for_row(). Returns (rows DataFrame, scores).
+    """
+    with closing(connect(db_path)) as conn:
+        # phone number or exact full name: indexed lookup, no fuzzy scoring
+        if looks_like_mobile(query):
+            exact = pd.read_sql_query(
+                "SELECT * FROM people WHERE _mobile = ? AND _mobile != '' ORDER BY _full, row_id LIMIT ?",
+                conn, params=(normalize_mobile(query), top_n))
+        else:
+            exact = pd.read_sql_query(
+                "SELECT * FROM people WHERE _full_lc = ? ORDER BY _full, row_id LIMIT ?",
+                conn, params=(query_lc, top_n))
+        if len(exact) or looks_like_mobile(query):
+            return exact, np.full(len(exact), 100.0)
+        row_ids = candidate_row_ids(conn, query_lc)
+        if not row_ids:
+            return pd.DataFrame(), np.array([], dtype=np.float64)
+        # row ids are plain ints from our own table, so inlining them is safe
+        people = pd.read_sql_query(
+            f"SELECT * FROM people WHERE row_id IN ({','.join(map(str, row_ids))}) ORDER BY row_id", conn
+        )
+    variants = build_variant_index(people)
+    scores = score_query(variants, query, query_lc)
+    top_idx = top_n_indices(scores, people["_full"].to_numpy(dtype=object), top_n)
+    return people.iloc[top_idx].reset_index(drop=True), scores[top_idx]
+
+
+# ---------- Compare with the pandas backend ----------
+def _rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def _measure(backend, xlsx_path, db_path, queries, top_n):
+    """Run in a fresh process: cold start, per-query latency, RSS, top-N ids."""
+    rss_start = _rss_mb()
+    t0 = time.perf_counter()
+    if backend == "pandas":
+        data = load_screening_data(xlsx_path)
+
+        def search(q, ql):
+            exact = exact_matches(data, q, ql, top_n)
+            if exact is not None:
+                return exact[0].tolist()
+            return top_n_indices(
+                search_scores(data.variants, data.trigrams, q, ql, MIN_TRIGRAM_OVERLAP, MIN_CANDIDATES), data.full, top_n).tolist()
+    else:
+        search = lambda q, ql: search_sqlite(db_path, q, ql, top_n)[0]["row_id"].tolist()
+    cold = time.perf_counter() - t0
+    latencies, results = [], []
+    for q in queries:
+        t = time.perf_counter()
+        results.append(search(q, q.casefold()))
+        latencies.append(time.perf_counter() - t)
+    return {
+        "cold_start_s": cold,
+        "p50_ms": 1000 * float(np.percentile(latencies, 50)),
+        "p95_ms": 1000 * float(np.percentile(latencies, 95)),
+        "rss_mb": _rss_mb(),
+        "rss_growth_mb": _rss_mb() - rss_start,
+        "results": results,
+    }
+
+
+def compare(xlsx_path, db_path, n_queries=100, top_n=15, seed=0):
+    if not is_current(xlsx_path, db_path):
+        build_sqlite(xlsx_path, db_path)
+    with closing(connect(db_path)) as conn:
+        names = [r[0] for r in conn.execute("SELECT _full FROM people WHERE _full != ''")]
+    rng = random.Random(seed)
+    queries = [rng.choice(names) for _ in range(n_queries)]
+    # also some partial names, like people type them
+    queries += [q.split()[0] for q in queries[: n_queries // 2]]
+
+    out = {}
+    for backend in ["pandas", "sqlite"]:
+        # separate process per backend so RSS and cold start are not shared
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "_measure", backend, xlsx_path,
+             "--db", db_path, "--top-n", str(top_n)],
+            input=json.dumps(queries), capture_output=True, text=True, check=True,
+        )
+        out[backend] = json.loads(proc.stdout)
+
+    overlap = [len(set(a) & set(b)) / max(len(a), 1)
+               for a, b in zip(out["pandas"]["results"], out["sqlite"]["results"])]
+    print(f"{len(queries)} queries, top {top_n}")
+    print(f"{'':10}{'cold start':>12}{'p50':>10}{'p95':>10}{'RSS':>10}{'RSS growth':>12}")
+    for backend in ["pandas", "sqlite"]:
+        r = out[backend]
+        print(f"{backend:10}{r['cold_start_s']:>11.2f}s{r['p50_ms']:>8.1f}ms{r['p95_ms']:>8.1f}ms{r['rss_mb']:>8.0f}MB{r['rss_growth_mb']:>10.0f}MB")
+    print(f"top-{top_n} overlap of sqlite with pandas: {np.mean(overlap):.1%}")
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SQLite FTS5 backend for Screening_Check")
+    parser.add_argument("command", choices=["build", "compare", "_measure"])
+    parser.add_argument("args", nargs="*")
+    parser.add_argument("--db", default=None, help="database path (default: workbook name with .sqlite)")
+    parser.add_argument("--queries", type=int, default=100, help="compare: number of sampled names")
+    parser.add_argument("--top-n", type=int, default=15)
+    ns = parser.parse_args(argv)
+
+    if ns.command == "_measure":
+        backend, xlsx_path = ns.args
+        queries = json.loads(sys.stdin.read())
+        print(json.dumps(_measure(backend, xlsx_path, ns.db, queries, ns.top_n)))
+        return
+
+    xlsx_path = ns.args[0] if ns.args else "Shelgaon.xlsx"
+    db_path = ns.db or default_db_path(xlsx_path)
+    if ns.command == "build":
+        t = time.perf_counter()
+        build_sqlite(xlsx_path, db_path)
+        print(f"built {db_path} in {time.perf_counter() - t:.1f} s")
+    else:
+        compare(xlsx_path, db_path, n_queries=ns.queries, top_n=ns.top_n)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+import pandas as pd
+
+from bulk_import import validate_mno
+
+
+def _sheet(rows):
+    return pd.DataFrame(rows, columns=["m_no", "family_head", "member"], dtype=object)
+
+
+def test_validate_mno_last_valid_copy_wins():
+    clean, errors = validate_mno(_sheet([["5", "first", "2"], ["5", "second", "3"]]))
+    assert clean[["m_no", "family_head"]].values.tolist() == [[5, "second"]]
+    assert errors["row"].tolist() == [2]
+    assert "repeated later" in errors["error"].iloc[0]
+
+
+def test_validate_mno_invalid_later_copy_does_not_reject_valid_row():
+    # the second row is invalid (no family head), so the first one is imported
+    clean, errors = validate_mno(_sheet([["5", "first", "2"], ["5", "", "3"]]))
+    assert clean[["m_no", "family_head", "member"]].values.tolist() == [[5, "first", 2]]
+    assert errors["row"].tolist() == [3]
+    assert errors["error"].iloc[0] == "family_head is required"
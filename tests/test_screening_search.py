@@ -0,0 +1,20 @@
+import pandas as pd
+
+from screening_search import compact_types
+
+
+def test_compact_types_whole_ages_are_int16():
+    df = pd.DataFrame({"Age": ["34", " 7", "", "x"]}, dtype=object)
+    age = compact_types(df)["Age"]
+    assert str(age.dtype) == "Int16"
+    assert age.tolist()[:2] == [34, 7]
+    assert age.isna().tolist() == [False, False, True, True]
+
+
+def test_compact_types_decimal_age_loads():
+    df = pd.DataFrame({"Age": ["34.5", "7", ""]}, dtype=object)
+    age = compact_types(df)["Age"]
+    assert age.dtype == "float32"
+    assert age.iloc[0] == 34.5
+    assert age.iloc[1] == 7
+    assert pd.isna(age.iloc[2])